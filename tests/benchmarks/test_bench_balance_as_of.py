@@ -0,0 +1,38 @@
+import random
+import time
+from datetime import datetime, timedelta
+import pytest
+from website.models import Account
+from website.main.utils import create_acc, balance_as_of
+from harness import seed_ledger
+
+START = datetime(2020, 1, 1)
+LOOKUPS = 1000
+
+@pytest.mark.parametrize('history', [1000, 10000, 100000, 1000000])
+def test_balance_as_of(app, record_property, history):
+    create_acc('executive', bal=1000)
+    create_acc('executive', bal=1000)
+
+    # The other account's history shares the index.
+    acc_no, other = [acc.acc_no for acc in Account.query.all()]
+    seed_ledger(acc_no, history, start=START, every=timedelta(minutes=5))
+    seed_ledger(other, history, start=START, every=timedelta(minutes=5))
+
+    # Random points through the history, a few before it starts.
+    generator = random.Random(history)
+    span = timedelta(minutes=5) * history
+    times = [START + span * generator.uniform(-0.01, 1) 
+             for _ in range(LOOKUPS)]
+
+    seconds = []
+    for at in times:
+        start = time.perf_counter()
+        balance_as_of(acc_no, at)
+        seconds.append(time.perf_counter() - start)
+
+    seconds.sort()
+
+    record_property('history', history)
+    record_property('mean_ms', sum(seconds) / LOOKUPS * 1000)
+    record_property('p99_ms', seconds[int(LOOKUPS * 0.99)] * 1000)
@@ -0,0 +1,69 @@
+import math
+import time
+import pytest
+from sqlalchemy import select, insert, func
+from website import db
+from website.models import Account, Transactions
+from website.admin.utils import Admin_Tools
+from website.utils.utils import term_interest
+
+# The apys accounts are opened with, cycled through.
+APYS = [0.0, 0.01, 0.025, 0.0375, 0.25]
+
+def open_accounts(n):
+    """Open n accounts with a spread of balances and apys in one bulk 
+    insert, every tenth one closed.
+
+    Args:
+        n (int): How many accounts.
+    """    
+
+    db.session.execute(insert(Account.__table__), [
+        {'acc_type': i % 2, 'username': 'executive', 
+         'apy': APYS[i % len(APYS)], 'min_bal': 0, 
+         'bal': 1000 + i * 7919 % 10000000, 'status': i % 10 != 9, 
+         'version': 1, 'shards': 0} 
+        for i in range(n)])
+
+    db.session.commit()
+
+# Compounded in one transaction, or in ten chunks.
+@pytest.mark.parametrize('chunks', [1, 10])
+@pytest.mark.parametrize('accounts', [10000, 100000, 1000000])
+def test_compound(app, record_property, accounts, chunks):
+    open_accounts(accounts)
+
+    before = dict(db.session.execute(
+        select(Account.acc_no, Account.bal).where(Account.status == True))
+        .all())
+
+    app.config['COMPOUND_CHUNK'] = 0 if chunks == 1 else accounts // chunks
+
+    start = time.perf_counter()
+    Admin_Tools.commit_all_compound()
+    seconds = time.perf_counter() - start
+
+    record_property('accounts', accounts)
+    record_property('chunks', chunks)
+    record_property('seconds', seconds)
+    record_property('accounts_per_second', accounts / seconds)
+
+    # Every open account was paid bal * term_interest(apy), half cents 
+    # rounded up, and nothing else was.
+    paid = db.session.execute(
+        select(Account.acc_no, Account.apy, Account.bal, Transactions.amt, 
+               Transactions.start_bal, Transactions.term)
+        .join(Transactions, Transactions.acc_no == Account.acc_no)).all()
+
+    assert len(paid) == len(before)
+
+    for acc_no, apy, bal, amt, start_bal, term in paid:
+        assert start_bal == before[acc_no]
+        assert amt == math.floor(start_bal * term_interest(apy) + 0.5)
+        assert bal == start_bal + amt
+        assert term == 0
+
+    closed = db.session.execute(
+        select(func.count()).where(Account.status == False)).scalar()
+
+    assert closed == accounts // 10
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy.orm.exc import StaleDataError
+from website import db
+from website.models import Account, Transactions
+from website.main.utils import create_acc, bulk_post
+from website.utils.format import to_dollars
+from harness import start_workers, summarize
+
+WORKERS = 4
+TRANSFERS = 200
+START = 10000000
+
+def bulk_transfer(command):
+    """Apply a transfer command through bulk_post, which checks balances 
+    without locking anything and retries if an account's version changed 
+    (optimistic), instead of make_transfer, which locks both accounts first 
+    (pessimistic). Runs in a worker process.
+
+    Args:
+        command (dict): The transfer command, see apply_command.
+
+    Returns:
+        str: The char code for the transfer, 'conflict' if it still 
+        conflicted after every retry.
+    """    
+
+    args = command['args']
+
+    try:
+        [(op, flash_code)] = bulk_post('executive', [
+            {'op': 'transfer', 'acc_no': args['acc_no'], 
+             'transfer_no': args['transfer_no'], 
+             'amt': to_dollars(args['amt']), 
+             'description': args['description']}])
+
+    except StaleDataError:
+        return 'conflict'
+
+    return flash_code
+
+@pytest.mark.parametrize('contended', [False, True])
+@pytest.mark.parametrize('locking', ['pessimistic', 'optimistic'])
+def test_transfers(app, tmp_path, record_property, locking, contended):
+    for _ in range(WORKERS * 2):
+        create_acc('executive', bal=START)
+
+    acc_nos = [acc.acc_no for acc in Account.query.all()]
+
+    # Contended workers all transfer between the same two accounts, half 
+    # each way, uncontended ones each have a pair of their own.
+    command_lists = []
+    for i in range(WORKERS):
+        acc_no, transfer_no = acc_nos[:2] if contended else \
+            acc_nos[2 * i:2 * i + 2]
+
+        if i % 2:
+            acc_no, transfer_no = transfer_no, acc_no
+
+        command_lists.append([
+            {'op': 'transfer', 
+             'args': {'acc_no': acc_no, 'transfer_no': transfer_no, 
+                      'amt': 100, 'description': 'Transfer'}} 
+            for _ in range(TRANSFERS)])
+
+    if locking == 'optimistic':
+        executor, futures = start_workers(str(tmp_path), command_lists, 
+                                          apply=bulk_transfer, timed=True)
+    else:
+        executor, futures = start_workers(str(tmp_path), command_lists, 
+                                          timed=True)
+
+    with executor:
+        results = [future.result() for future in futures]
+
+    codes = [flash_code for worker in results for flash_code, _, _ in worker]
+
+    record_property('transfers', len(codes))
+    record_property('conflicts', codes.count('conflict'))
+
+    for name, value in summarize(results).items():
+        record_property(name, value)
+
+    assert set(codes) <= {'5', 'conflict'}
+
+    # Money only moved between the accounts, once for every transfer made.
+    db.session.expire_all()
+
+    assert sum(acc.bal for acc in Account.query) == len(acc_nos) * START
+    assert Transactions.query.count() == 2 * codes.count('5')
@@ -0,0 +1,52 @@
+import time
+from datetime import date, datetime, timedelta
+import pytest
+from website.models import Account
+from website.main.utils import create_acc
+from harness import seed_ledger
+
+REQUESTS = 5
+
+@pytest.fixture(params=[3650, 36500])
+def history(request, app):
+    """An account for the admin user with a posting every day up to 
+    yesterday, ten or a hundred years of them.
+
+    Returns:
+        tuple: The account number and the number of days.
+    """    
+
+    days = request.param
+
+    create_acc('executive', bal=1000)
+    acc_no = Account.query.first().acc_no
+
+    start = datetime.combine(date.today() - timedelta(days=days), 
+                             datetime.min.time())
+    seed_ledger(acc_no, days, start=start, every=timedelta(days=1))
+
+    return acc_no, days
+
+# Every point, what a narrow and a wide chart ask for, in either format.
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('max_points', [0, 300, 1000])
+def test_graph_data(client, history, record_property, max_points, compact):
+    acc_no, days = history
+
+    url = f'/{acc_no}/account_graph_data/?max_points={max_points}'
+    if compact:
+        url += '&format=compact'
+
+    seconds = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = client.get(url)
+        seconds.append(time.perf_counter() - start)
+
+        assert response.status_code == 200
+
+    record_property('days', days)
+    record_property('max_points', max_points)
+    record_property('format', 'compact' if compact else 'default')
+    record_property('kb', len(response.get_data()) / 1000)
+    record_property('mean_ms', sum(seconds) / REQUESTS * 1000)
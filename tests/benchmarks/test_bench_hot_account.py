@@ -0,0 +1,47 @@
+import pytest
+from website import db
+from website.models import Account, Transactions
+from website.main.utils import create_acc, set_shards
+from harness import start_workers, summarize
+
+WORKERS = 6
+CREDITS = 200
+
+@pytest.mark.parametrize('shards', [0, 8])
+def test_credits(app, tmp_path, record_property, shards):
+    create_acc('executive', bal=0)
+    create_acc('executive', bal=10000000)
+
+    hot, payer = [acc.acc_no for acc in Account.query.all()]
+
+    set_shards(hot, shards)
+
+    # Half the workers deposit into the account, the other half transfer 
+    # into it.
+    executor, futures = start_workers(str(tmp_path), [
+        [{'op': 'transfer', 
+          'args': {'acc_no': payer, 'transfer_no': hot, 'amt': 100, 
+                   'description': 'Payroll'}} if i % 2 else 
+         {'op': 'deposit', 
+          'args': {'acc_no': hot, 'amt': 100, 'description': 'Deposit'}} 
+         for _ in range(CREDITS)] 
+        for i in range(WORKERS)], timed=True)
+
+    with executor:
+        results = [future.result() for future in futures]
+
+    record_property('shards', shards)
+    record_property('credits', WORKERS * CREDITS)
+
+    for name, value in summarize(results).items():
+        record_property(name, value)
+
+    assert {flash_code for worker in results 
+            for flash_code, _, _ in worker} <= {'1', '5'}
+
+    # Every credit counted once in the whole balance.
+    db.session.expire_all()
+
+    assert Account.query.get(hot).bal == WORKERS * CREDITS * 100
+    assert Transactions.query.filter_by(acc_no=hot).count() == \
+        WORKERS * CREDITS
@@ -0,0 +1,96 @@
+import time
+import pytest
+from website import db
+from website.models import Account, Transactions
+from website.main.utils import create_acc
+from website.writer.commands import apply_command
+from harness import make_app, seed_ledger, start_workers, summarize
+
+HISTORY = 20000
+REQUESTS = 50
+WORKERS = 6
+POSTINGS = 200
+
+# The GET routes the dashboards and history pages poll.
+HOT_ROUTES = ['/{}/account_graph_data/', '/{}/analytics_data/',
+              '/{}/transactions/', '/{}/balance_as_of/?at=2021-06-01',
+              '/search/?q=coffee', '/timeline/']
+
+@pytest.fixture
+def ledger(app):
+    """An account for the admin user with a long history.
+
+    Returns:
+        int: The account number.
+    """    
+
+    create_acc('executive', bal=1000)
+    acc_no = Account.query.first().acc_no
+
+    seed_ledger(acc_no, HISTORY)
+
+    return acc_no
+
+@pytest.mark.parametrize('route', HOT_ROUTES)
+@pytest.mark.parametrize('profile', ['durable', 'throughput',
+                                     'readonly-replica'])
+def test_read_routes(ledger, tmp_path, record_property, profile, route):
+    client = make_app(str(tmp_path), {'STORAGE_PROFILE': profile}) \
+        .test_client()
+
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    url = route.format(ledger)
+
+    # The first request opens the connection and fills the caches.
+    assert client.get(url).status_code == 200
+
+    latencies = []
+    for _ in range(REQUESTS):
+        # Read the body too, the timeline is streamed.
+        start = time.perf_counter()
+        response = client.get(url)
+        response.get_data()
+        latencies.append(time.perf_counter() - start)
+
+        assert response.status_code == 200
+
+    latencies.sort()
+
+    record_property('profile', profile)
+    record_property('route', route)
+    record_property('requests_per_second', REQUESTS / sum(latencies))
+    record_property('p50_ms', latencies[REQUESTS // 2] * 1000)
+    record_property('p99_ms', latencies[int(REQUESTS * 0.99)] * 1000)
+
+# A read-only replica takes no postings, see writes_allowed.
+@pytest.mark.parametrize('profile', ['durable', 'throughput'])
+def test_postings(app, tmp_path, record_property, profile):
+    for _ in range(WORKERS):
+        create_acc('executive', bal=10000)
+
+    acc_nos = [acc.acc_no for acc in Account.query.all()]
+
+    executor, futures = start_workers(str(tmp_path), [
+        [{'op': 'deposit',
+          'args': {'acc_no': acc_no, 'amt': 100, 'description': 'Posting'}}
+         for _ in range(POSTINGS)]
+        for acc_no in acc_nos],
+        apply=apply_command, timed=True, config={'STORAGE_PROFILE': profile})
+
+    with executor:
+        results = [future.result() for future in futures]
+
+    record_property('profile', profile)
+
+    for name, value in summarize(results).items():
+        record_property(name, value)
+
+    assert {flash_code for worker in results
+            for flash_code, _, _ in worker} == {'1'}
+
+    db.session.expire_all()
+
+    assert Transactions.query.count() == WORKERS * POSTINGS
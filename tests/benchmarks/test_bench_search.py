@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+import pytest
+from website.models import Account
+from website.main.utils import create_acc, search_transactions
+from harness import seed_ledger
+
+RUNS = 20
+SIZE = 50
+
+# A description word in every eighth transaction, a single transaction, a 
+# deep page of the common word and a word in none.
+QUERIES = [('common', 'coffee', 0), ('rare', 'refund 1006', 0), 
+           ('deep_page', 'coffee', 100), ('miss', 'mortgage', 0)]
+
+@pytest.mark.parametrize('ledger', [100000, 1000000, 2000000])
+def test_search(app, record_property, ledger):
+    create_acc('executive', bal=1000)
+    create_acc('someone', bal=1000)
+
+    # Half the ledger is the user's, half someone else's.
+    mine, theirs = [acc.acc_no for acc in Account.query.all()]
+    seed_ledger(mine, ledger // 2, every=timedelta(minutes=1))
+    seed_ledger(theirs, ledger // 2, every=timedelta(minutes=1))
+
+    record_property('ledger', ledger)
+
+    for name, text, page in QUERIES:
+        seconds = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            rows, _ = search_transactions('executive', text, SIZE, page=page)
+            seconds.append(time.perf_counter() - start)
+
+        assert all(row.acc_no == mine for row in rows)
+
+        record_property(f'{name}_results', len(rows))
+        record_property(f'{name}_ms', sum(seconds) / RUNS * 1000)
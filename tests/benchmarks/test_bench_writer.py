@@ -0,0 +1,123 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from website import db
+from website.models import Account, Transactions
+from website.main.utils import create_acc
+from website.writer import submit
+from website.writer.commands import apply_command
+from harness import start_workers, start_writer, summarize
+
+WORKERS = 6
+POSTINGS = 200
+
+def post_directly(command):
+    """Apply a command from the worker itself, counting a locked database as 
+    a failure rather than stopping the worker. Runs in a worker process.
+
+    Args:
+        command (dict): The command, see apply_command.
+
+    Returns:
+        str: The char code, 'locked' if the database stayed locked.
+    """    
+
+    try:
+        return apply_command(command)
+
+    except OperationalError:
+        db.session.rollback()
+        return 'locked'
+
+def post_to_writer(command):
+    """Send a command to the writer, see submit. Runs in a worker process.
+
+    Args:
+        command (dict): The command, see apply_command.
+
+    Returns:
+        str: The char code.
+    """    
+
+    return submit(command['op'], **command['args'])
+
+@pytest.mark.parametrize('mode', ['direct', 'writer'])
+def test_postings(app, tmp_path, record_property, mode):
+    for _ in range(WORKERS):
+        create_acc('executive', bal=10000)
+
+    acc_nos = [acc.acc_no for acc in Account.query.all()]
+
+    if mode == 'writer':
+        server = start_writer(app)
+
+    # Each worker deposits to and withdraws from its own account.
+    executor, futures = start_workers(str(tmp_path), [
+        [{'op': 'deposit' if i % 2 else 'withdraw', 
+          'args': {'acc_no': acc_no, 'amt': 100, 'description': 'Posting'}} 
+         for i in range(POSTINGS)] 
+        for acc_no in acc_nos], 
+        apply=post_directly if mode == 'direct' else post_to_writer, 
+        timed=True, config={'POSTING_MODE': mode})
+
+    with executor:
+        results = [future.result() for future in futures]
+
+    if mode == 'writer':
+        server.shutdown()
+        server.server_close()
+
+    codes = [flash_code for worker in results for flash_code, _, _ in worker]
+    posted = codes.count('1') + codes.count('2')
+
+    record_property('postings', len(codes))
+    record_property('failures', len(codes) - posted)
+
+    for name, value in summarize(results).items():
+        record_property(name, value)
+
+    # Every posting that went through was written once.
+    db.session.expire_all()
+
+    assert Transactions.query.count() == posted
+
+@pytest.mark.parametrize('window', [0, 1, 2, 5, 10, 20])
+def test_group_commit_window(app, tmp_path, record_property, window):
+    for _ in range(WORKERS):
+        create_acc('executive', bal=10000)
+
+    acc_nos = [acc.acc_no for acc in Account.query.all()]
+
+    # Count the writer's commits, it runs on a thread of this process.
+    commits = []
+    event.listen(db.engine, 'commit', lambda conn: commits.append(1))
+
+    app.config['GROUP_COMMIT_WINDOW_MS'] = window
+    server = start_writer(app)
+
+    executor, futures = start_workers(str(tmp_path), [
+        [{'op': 'deposit', 
+          'args': {'acc_no': acc_no, 'amt': 100, 'description': 'Posting'}} 
+         for _ in range(POSTINGS)] 
+        for acc_no in acc_nos], 
+        apply=post_to_writer, timed=True, config={'POSTING_MODE': 'writer'})
+
+    with executor:
+        results = [future.result() for future in futures]
+
+    server.shutdown()
+    server.server_close()
+
+    record_property('window_ms', window)
+    record_property('postings', WORKERS * POSTINGS)
+    record_property('commits', len(commits))
+
+    for name, value in summarize(results).items():
+        record_property(name, value)
+
+    assert {flash_code for worker in results 
+            for flash_code, _, _ in worker} == {'1'}
+
+    db.session.expire_all()
+
+    assert Transactions.query.count() == WORKERS * POSTINGS
@@ -0,0 +1,75 @@
+import pytest
+from website import db
+from harness import make_app, setup_db
+
+def pytest_addoption(parser):
+    parser.addoption('--bench', action='store_true', 
+                     help='Also run the benchmarks in tests/benchmarks.')
+
+def pytest_collection_modifyitems(config, items):
+    """Skip the benchmarks unless --bench is given, they take minutes.
+    """    
+
+    if config.getoption('--bench'):
+        return
+
+    skip = pytest.mark.skip(reason='benchmark, run with --bench')
+
+    for item in items:
+        if 'benchmarks' in item.path.parts:
+            item.add_marker(skip)
+
+def pytest_terminal_summary(terminalreporter):
+    """Print what each test recorded with record_property, e.g. benchmark 
+    timings.
+    """    
+
+    reports = [report for report in terminalreporter.getreports('passed') 
+               if report.user_properties]
+
+    if not reports:
+        return
+
+    terminalreporter.section('recorded properties')
+
+    for report in reports:
+        terminalreporter.write_line(report.nodeid)
+
+        for name, value in report.user_properties:
+            if isinstance(value, float):
+                value = f'{value:.4g}'
+
+            terminalreporter.write_line(f'    {name}: {value}')
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a fresh database, with an app context pushed.
+
+    Yields:
+        Flask: The app.
+    """    
+
+    app = make_app(str(tmp_path))
+    setup_db(app)
+
+    with app.app_context():
+        yield app
+
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as the admin user, who owns the accounts the 
+    tests create.
+
+    Returns:
+        FlaskClient: The client.
+    """    
+
+    client = app.test_client()
+
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    return client
@@ -0,0 +1,210 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from sqlalchemy import insert, update
+from werkzeug.security import generate_password_hash
+from website import create_app, db
+from website.models import Bank_Settings, User, Curr_Term, Account, \
+    Transactions
+from website.admin.utils import Admin_Tools
+from website.database.upgrade_db import stamp
+from website.writer.commands import apply_command
+from website.writer.server import Writer_Server
+
+def make_app(db_dir, config=None):
+    """Create the app on a scratch database and term stamp in a directory, 
+    so worker processes can open the same ones.
+
+    Args:
+        db_dir (str): The directory to keep the database and stamp in.
+        config (dict, optional): More app_config.json values to replace, 
+        e.g. the posting mode. Defaults to None.
+
+    Returns:
+        Flask: The app.
+    """    
+
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_dir}/bank_data.db', 
+        'TERM_STAMP': f'{db_dir}/term.stamp', 
+        'WRITER_SOCKET': f'{db_dir}/writer.sock', 
+        'POSTING_MODE': 'direct', 
+        **(config or {})})
+
+def setup_db(app):
+    """Create the schema and the default data setup_db writes: bank 
+    settings, the admin user and term 0.
+
+    Args:
+        app (Flask): The app to set the database up for.
+    """    
+
+    with app.app_context():
+        db.create_all()
+
+        db.session.add(Bank_Settings(savings_apy=0.25, savings_min=500, 
+                                     checkings_apy=0.0, checkings_min=0))
+        db.session.add(User(id=1, username='executive', name='Admin', 
+                            password=generate_password_hash('password')))
+        db.session.add(Curr_Term(term=0))
+        db.session.commit()
+
+        with db.engine.begin() as conn:
+            stamp(conn)
+
+# Descriptions seeded transactions are given, cycled through.
+DESCRIPTIONS = ['Pay', 'Rent', 'Groceries', 'Coffee shop', 'Electric bill', 
+                'Transfer to savings', 'Refund', 'Phone bill']
+
+def seed_ledger(acc_no, transactions, start=datetime(2020, 1, 1), 
+                every=timedelta(hours=1)):
+    """Give an account a long history, inserted in bulk rather than posted 
+    one at a time. Deposits and withdrawals alternate, each one leaving the 
+    account with more than before, then the account's balance is set to 
+    where the history ends and Balance_Data is rebuilt.
+
+    Args:
+        acc_no (int): The account, with no transactions yet.
+        transactions (int): How many transactions to add.
+        start (datetime, optional): When the first one was made. Defaults 
+        to 2020-01-01.
+        every (timedelta, optional): The time between transactions. 
+        Defaults to an hour.
+
+    Returns:
+        int: The balance the account ends with, in cents.
+    """    
+
+    bal = db.session.get(Account, acc_no).base_bal
+
+    rows = []
+    for i in range(transactions):
+        deposit = i % 2 == 0
+        amt = 1000 + i % 997 if deposit else 500 + i % 499
+
+        rows.append({'acc_no': acc_no, 'date': start + every * i, 'amt': amt, 
+                     'start_bal': bal, 'end_bal': bal + (amt if deposit 
+                                                         else -amt), 
+                     'withdrawal_deposit': deposit, 'term': 0, 
+                     'description': f'{DESCRIPTIONS[i % len(DESCRIPTIONS)]} '
+                                    f'{i}'})
+        bal = rows[-1]['end_bal']
+
+        # Insert in batches so millions of rows aren't held at once.
+        if len(rows) == 100000:
+            db.session.execute(insert(Transactions.__table__), rows)
+            rows = []
+
+    if rows:
+        db.session.execute(insert(Transactions.__table__), rows)
+
+    db.session.execute(update(Account.__table__)
+                       .where(Account.acc_no == acc_no).values(bal=bal))
+    db.session.commit()
+
+    Admin_Tools.rebuild_bal_data()
+
+    return bal
+
+def start_writer(app):
+    """Run the writer process's server on threads of this process, see 
+    website/writer/server.py.
+
+    Args:
+        app (Flask): The app the writer applies commands with.
+
+    Returns:
+        Writer_Server: The server, shut it down and close it when done.
+    """    
+
+    server = Writer_Server(app, Path(app.config['WRITER_SOCKET']))
+
+    threading.Thread(target=server.apply_commands, daemon=True).start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+def post_commands(db_dir, commands, apply=apply_command, timed=False, 
+                  config=None):
+    """Apply posting commands one after another from a fresh app, the way a 
+    web worker posting directly would. Runs in a worker process.
+
+    Args:
+        db_dir (str): The directory holding the database, see make_app.
+        commands (list[dict]): The commands for apply_command.
+        apply (function, optional): What to apply each command with, it 
+        must be importable from the worker. Defaults to apply_command.
+        timed (bool, optional): Time each command. Defaults to False.
+        config (dict, optional): App config values, see make_app. Defaults 
+        to None.
+
+    Returns:
+        list: The char code for each command, in order. If timed, a tuple of 
+        the char code and the time (time.time) the command started and ended.
+    """    
+
+    app = make_app(db_dir, config)
+
+    with app.app_context():
+        if not timed:
+            return [apply(command) for command in commands]
+
+        results = []
+        for command in commands:
+            start = time.time()
+            flash_code = apply(command)
+            results.append((flash_code, start, time.time()))
+
+        return results
+
+def start_workers(db_dir, command_lists, **kwargs):
+    """Start a process for each list of commands, posting them at the same 
+    time as each other (and whatever the caller does meanwhile).
+
+    Args:
+        db_dir (str): The directory holding the database, see make_app.
+        command_lists (list[list[dict]]): The commands for each process.
+        **kwargs: Keyword arguments for post_commands.
+
+    Returns:
+        tuple: The executor, shut it down when done, and a future for each 
+        process resolving to its results, see post_commands. An exception in 
+        a worker is raised by its future.
+    """    
+
+    # Spawned rather than forked, so no worker shares the parent's 
+    # database connections.
+    executor = ProcessPoolExecutor(
+        max_workers=len(command_lists), 
+        mp_context=multiprocessing.get_context('spawn'))
+
+    futures = [executor.submit(post_commands, db_dir, commands, **kwargs) 
+               for commands in command_lists]
+
+    return executor, futures
+
+def summarize(results):
+    """Work out throughput and latency from timed commands.
+
+    Args:
+        results (list[list[tuple]]): The timed results of each worker, see 
+        post_commands.
+
+    Returns:
+        dict: "postings_per_second" from the first command starting to the 
+        last one ending, and the "p50_ms" and "p99_ms" latencies.
+    """    
+
+    times = [(start, end) for worker in results for _, start, end in worker]
+
+    first = min(start for start, _ in times)
+    last = max(end for _, end in times)
+
+    latencies = sorted(end - start for start, end in times)
+
+    return {'postings_per_second': len(times) / (last - first), 
+            'p50_ms': latencies[len(latencies) // 2] * 1000, 
+            'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000}
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select
+from website import db
+from website.models import Account, Balance_Data, Transactions
+from website.admin.utils import Admin_Tools
+from website.main.utils import create_acc, make_deposit, make_withdrawal, \
+    make_transfer, bulk_post, set_shards, daily_balances, last_bal_each_day
+
+START = datetime(2030, 1, 7, 9)
+
+class Clock(datetime):
+    """
+    A datetime whose now() is whatever the test set last.
+    """    
+
+    at = START
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.at
+
+@pytest.fixture
+def clock(app, monkeypatch):
+    """Stand in for the clock postings read.
+
+    Yields:
+        type: Clock, set Clock.at to move time on.
+    """    
+
+    monkeypatch.setattr('website.main.utils.datetime', Clock)
+    monkeypatch.setattr('website.admin.utils.datetime', Clock)
+    Clock.at = START
+
+    yield Clock
+
+def rollup(*acc_nos):
+    """Read Balance_Data.
+
+    Args:
+        *acc_nos (int): The accounts to read, every account if none.
+
+    Returns:
+        list[tuple]: The account number, date and balance of every row.
+    """    
+
+    stmt = select(Balance_Data.acc_no, Balance_Data.date, Balance_Data.bal) \
+        .order_by(Balance_Data.acc_no, Balance_Data.date)
+
+    if acc_nos:
+        stmt = stmt.where(Balance_Data.acc_no.in_(acc_nos))
+
+    return [tuple(row) for row in db.session.execute(stmt)]
+
+def post_days(clock, days, acc_no, transfer_no):
+    """Make a mix of postings on two accounts over a few days, a few
+    postings at different times each day.
+
+    Args:
+        clock (type): The clock fixture.
+        days (int): How many days to post on.
+        acc_no (int): The first account.
+        transfer_no (int): The second account.
+    """    
+
+    for day in range(days):
+        clock.at = START + timedelta(days=day)
+
+        make_deposit(acc_no, 1000 + day, 'Pay')
+        make_withdrawal(transfer_no, 300, 'Rent')
+
+        clock.at += timedelta(hours=2)
+
+        make_transfer(acc_no, transfer_no, 'Transfer', amt=250 + day)
+        db.session.commit()
+
+        bulk_post('executive', [
+            {'op': 'deposit', 'acc_no': transfer_no, 'amt': 1.25},
+            {'op': 'withdraw', 'acc_no': acc_no, 'amt': 2}])
+
+        clock.at += timedelta(hours=6)
+
+        make_withdrawal(acc_no, 100, 'Groceries')
+
+def test_rollup_matches_backfill(clock):
+    create_acc('executive', bal=1000, min_bal=500, acc_type=0)
+    create_acc('executive', bal=0, acc_type=1)
+    create_acc('executive', bal=5000, acc_type=1)
+
+    a, b, idle = [acc.acc_no for acc in Account.query.all()]
+
+    post_days(clock, 4, a, b)
+
+    clock.at += timedelta(days=1)
+    Admin_Tools.compound_range(a, idle + 1)
+    db.session.commit()
+
+    maintained = rollup()
+
+    # A row for every day each account had a posting.
+    assert len(rollup(a)) == len(rollup(b)) == 5
+    assert rollup(idle) == [(idle, clock.at.date(), 5000)]
+
+    Admin_Tools.rebuild_bal_data()
+
+    assert rollup() == maintained
+
+def test_hot_account_days(clock):
+    create_acc('executive', bal=1000, acc_type=0)
+    create_acc('executive', bal=1000, acc_type=1)
+
+    hot, other = [acc.acc_no for acc in Account.query.all()]
+
+    set_shards(hot, 4)
+
+    post_days(clock, 3, other, hot)
+
+    # Postings never wrote the hot account's rollup.
+    assert rollup(hot) == []
+
+    clock.at = START + timedelta(days=3)
+
+    # Its days are read from its transactions instead.
+    expected = [(day, bal) for acc_no, day, bal in db.session.execute(
+        last_bal_each_day(Transactions.acc_no == hot)
+        .order_by('day'))]
+
+    assert len(expected) == 3
+    assert [tuple(row) for row in daily_balances(hot)] == \
+        expected + [(clock.at.date(), Account.query.get(hot).bal)]
+    assert [tuple(row) for row in daily_balances(
+        hot, since=START.date())][:-1] == expected[1:]
+
+    # Turning hot account mode off rebuilds the rollup, the same days come
+    # from it after.
+    set_shards(hot, 0)
+
+    assert rollup(hot) == [(hot, day, bal) for day, bal in expected]
+    assert [tuple(row) for row in daily_balances(hot)][:-1] == expected
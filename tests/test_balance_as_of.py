@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+import pytest
+from website.models import Account
+from website.main.utils import create_acc, balance_as_of
+from harness import seed_ledger
+
+START = datetime(2030, 1, 1, 9)
+
+@pytest.fixture
+def accounts(app):
+    """Two accounts for the admin user, the first with a transaction every
+    hour for four days and the second with none, and an account owned by
+    someone else.
+
+    Returns:
+        tuple: The account numbers.
+    """    
+
+    create_acc('executive', bal=1000)
+    create_acc('executive', bal=250)
+    create_acc('someone', bal=0)
+
+    acc_nos = tuple(acc.acc_no for acc in Account.query.all())
+    seed_ledger(acc_nos[0], 96, start=START)
+
+    return acc_nos
+
+def test_balances_through_history(accounts):
+    acc_no, _, _ = accounts
+
+    # A deposit of 10.00, then a withdrawal of 5.01, and so on.
+    assert balance_as_of(acc_no, START) == 2000
+    assert balance_as_of(acc_no, START + timedelta(minutes=59)) == 2000
+    assert balance_as_of(acc_no, START + timedelta(hours=1)) == 1499
+    assert balance_as_of(acc_no, START + timedelta(hours=1, minutes=1)) \
+        == 1499
+    assert balance_as_of(acc_no, START + timedelta(hours=2)) == 2501
+
+def test_before_first_transaction(accounts):
+    acc_no, _, _ = accounts
+
+    # What it opened with, not what it holds now.
+    assert balance_as_of(acc_no, START - timedelta(microseconds=1)) == 1000
+    assert balance_as_of(acc_no, datetime(1970, 1, 1)) == 1000
+
+def test_after_last_transaction(accounts):
+    acc_no, _, _ = accounts
+
+    bal = Account.query.get(acc_no).bal
+
+    assert balance_as_of(acc_no, START + timedelta(hours=95)) == bal
+    assert balance_as_of(acc_no, datetime(2100, 1, 1)) == bal
+
+def test_no_transactions(accounts):
+    _, idle, _ = accounts
+
+    for at in (datetime(1970, 1, 1), START, datetime(2100, 1, 1)):
+        assert balance_as_of(idle, at) == 250
+
+def test_same_time_transactions(app):
+    create_acc('executive', bal=1000)
+    acc_no = Account.query.first().acc_no
+
+    # Transactions at the same moment count in the order they were made.
+    bal = seed_ledger(acc_no, 5, start=START, every=timedelta(0))
+
+    assert balance_as_of(acc_no, START) == bal
+    assert balance_as_of(acc_no, START - timedelta(microseconds=1)) == 1000
+
+def test_missing_account(accounts):
+    assert balance_as_of(999999, START) is None
+
+@pytest.mark.parametrize('at, bal', [
+    ('2029-12-31', 10.0),
+    ('2030-01-01T09:00:00', 20.0),
+    ('2030-01-01T10:30:00', 14.99)])
+def test_route(client, accounts, at, bal):
+    acc_no, _, _ = accounts
+
+    response = client.get(f'/{acc_no}/balance_as_of/?at={at}')
+
+    assert response.status_code == 200
+    assert response.json['bal'] == bal
+
+def test_route_whole_day(client, accounts):
+    acc_no, _, _ = accounts
+
+    def bal(at):
+        return client.get(f'/{acc_no}/balance_as_of/?at={at}').json['bal']
+
+    # A day on its own is the end of the day, after the 23:00 transaction.
+    assert bal('2030-01-01') == bal('2030-01-01T23:59:59.999999') == \
+        balance_as_of(acc_no, datetime(2030, 1, 1, 23)) / 100
+    assert bal('2030-01-01') != bal('2030-01-01T22:59:59')
+
+@pytest.mark.parametrize('at', ['', 'yesterday', '2030-13-01', '01-01-2030'])
+def test_route_malformed(client, accounts, at):
+    acc_no, _, _ = accounts
+
+    response = client.get(f'/{acc_no}/balance_as_of/?at={at}')
+
+    assert response.status_code == 400
+    assert response.json == {'error': 'The date is malformed.'}
+
+def test_route_other_users_account(client, accounts):
+    _, _, other = accounts
+
+    response = client.get(f'/{other}/balance_as_of/?at=2030-01-01')
+
+    assert response.status_code == 302
+
+def test_admin_route(client, accounts):
+    acc_no, _, other = accounts
+
+    # Admins can look up anyone's account, a missing one is a 404.
+    assert client.get(f'/admin/{other}/balance_as_of/?at=2030-01-01') \
+        .json['bal'] == 0
+    assert client.get(f'/admin/{acc_no}/balance_as_of/?at=2029-12-31') \
+        .json['bal'] == 10.0
+
+    response = client.get('/admin/999999/balance_as_of/?at=2030-01-01')
+
+    assert response.status_code == 404
+    assert response.json == {'error': 'That account does not exist.'}
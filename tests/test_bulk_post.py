@@ -0,0 +1,179 @@
+import pytest
+from sqlalchemy import event
+from website import db
+from website.models import Account, Transactions
+from website.main.utils import create_acc, CONFLICT_ATTEMPTS
+
+@pytest.fixture
+def accounts(app):
+    """A savings account and a checkings account for the admin user, and
+    an account owned by someone else.
+
+    Returns:
+        tuple: The account numbers of the savings, checkings and other
+        user's accounts.
+    """    
+
+    create_acc('executive', bal=1000, min_bal=500, acc_type=0)
+    create_acc('executive', bal=0, acc_type=1)
+    create_acc('someone', bal=0, acc_type=1)
+
+    return tuple(acc.acc_no for acc in Account.query.all())
+
+@pytest.fixture
+def conflicts(app):
+    """Change the version of every account bulk_post is about to update,
+    just before it updates them, as if other postings got there first.
+
+    Yields:
+        list[int]: How many more times to cause a conflict, [1] by default.
+        Set it before posting.
+    """    
+
+    remaining = [1]
+
+    def bump(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE account') and remaining[0]:
+            remaining[0] -= 1
+
+            conn.connection.dbapi_connection.execute(
+                'UPDATE account SET version = version + 1')
+
+    event.listen(db.engine, 'before_cursor_execute', bump)
+
+    yield remaining
+
+    event.remove(db.engine, 'before_cursor_execute', bump)
+
+def post(client, postings):
+    """Post a batch through the bulk posting endpoint.
+
+    Args:
+        client (FlaskClient): The logged in client.
+        postings (list): The postings.
+
+    Returns:
+        Response: The response.
+    """    
+
+    return client.post('/bulk_post/', json={'postings': postings})
+
+def bals(*acc_nos):
+    """Read account balances fresh from the database.
+
+    Returns:
+        list[int]: The balance of each account in cents.
+    """    
+
+    db.session.expire_all()
+
+    return [Account.query.get(acc_no).bal for acc_no in acc_nos]
+
+def test_codes_follow_running_balances(client, accounts):
+    savings, checkings, other = accounts
+
+    response = post(client, [
+        {'op': 'deposit', 'acc_no': savings, 'amt': 2, 'description': 'a'},
+        # Down to the minimum balance, allowed.
+        {'op': 'withdraw', 'acc_no': savings, 'amt': '7.00'},
+        # A cent below it, refused against the balance the batch left.
+        {'op': 'withdraw', 'acc_no': savings, 'amt': 0.01},
+        {'op': 'transfer', 'acc_no': savings, 'transfer_no': checkings,
+         'amt': 0.01},
+        {'op': 'deposit', 'acc_no': checkings, 'amt': 5},
+        {'op': 'transfer', 'acc_no': checkings, 'transfer_no': savings,
+         'amt': 1.5},
+        {'op': 'transfer', 'acc_no': checkings, 'transfer_no': other,
+         'amt': 1},
+        {'op': 'transfer', 'acc_no': checkings, 'transfer_no': 999999,
+         'amt': 1},
+        {'op': 'deposit', 'acc_no': other, 'amt': 1},
+        {'op': 'withdraw', 'acc_no': 999999, 'amt': 1}])
+
+    assert response.status_code == 200
+    assert [result['flash_code'] for result in response.json['results']] \
+        == ['1', '2', '1', '4', '1', '5', '3', '1', '0', '0']
+    assert response.json['results'][6]['message'] == \
+        'Transfer failed. Recieving and sending account owners did not match.'
+
+    assert bals(savings, checkings, other) == [650, 350, 0]
+
+    # A transaction for each posting made, both sides of the transfer,
+    # chained from the balance the one before left.
+    rows = Transactions.query.filter_by(acc_no=savings) \
+        .order_by(Transactions.transaction_no).all()
+
+    assert [(row.start_bal, row.end_bal) for row in rows] == \
+        [(1000, 1200), (1200, 500), (500, 650)]
+    assert Transactions.query.filter_by(acc_no=checkings).count() == 2
+    assert Transactions.query.filter_by(acc_no=other).count() == 0
+
+@pytest.mark.parametrize('posting', [
+    'deposit',
+    None,
+    {'acc_no': 1, 'amt': 1},
+    {'op': 'borrow', 'acc_no': 1, 'amt': 1},
+    {'op': 'deposit', 'amt': 1},
+    {'op': 'deposit', 'acc_no': 'one', 'amt': 1},
+    {'op': 'deposit', 'acc_no': 1, 'amt': 'lots'},
+    {'op': 'deposit', 'acc_no': 1, 'amt': None},
+    {'op': 'deposit', 'acc_no': 1, 'amt': -9},
+    {'op': 'deposit', 'acc_no': 1, 'amt': 0},
+    {'op': 'deposit', 'acc_no': 1, 'amt': 0.001},
+    {'op': 'withdraw', 'acc_no': 1, 'amt': -100},
+    {'op': 'transfer', 'acc_no': 2, 'transfer_no': 1, 'amt': -100},
+    {'op': 'transfer', 'acc_no': 1, 'amt': 1},
+    {'op': 'transfer', 'acc_no': 1, 'transfer_no': [2], 'amt': 1},
+    {'op': 'transfer', 'acc_no': 1, 'transfer_no': {}, 'amt': 1}])
+def test_malformed_postings(client, accounts, posting):
+    savings, checkings, other = accounts
+
+    # The malformed posting is reported on its own, the rest still post.
+    response = post(client, [posting, {'op': 'deposit', 'acc_no': savings,
+                                       'amt': 1}])
+
+    assert response.status_code == 200
+    assert response.json['results'] == [
+        {'flash_code': '0',
+         'message': 'Posting not processed, the posting is malformed.'},
+        {'flash_code': '1', 'message': 'Deposit successful.'}]
+
+    assert bals(savings, checkings, other) == [1100, 0, 0]
+    assert Transactions.query.count() == 1
+
+@pytest.mark.parametrize('body', [None, [], {}, {'postings': 'deposit'},
+                                  {'postings': {'op': 'deposit'}}])
+def test_malformed_body(client, accounts, body):
+    response = client.post('/bulk_post/', json=body)
+
+    assert response.status_code == 400
+    assert Transactions.query.count() == 0
+
+def test_conflict_is_retried(client, accounts, conflicts):
+    savings, checkings, other = accounts
+
+    response = post(client, [
+        {'op': 'deposit', 'acc_no': checkings, 'amt': 1},
+        {'op': 'transfer', 'acc_no': savings, 'transfer_no': checkings,
+         'amt': 1}])
+
+    # Checked again from fresh balances and posted once.
+    assert response.status_code == 200
+    assert conflicts == [0]
+    assert bals(savings, checkings) == [900, 200]
+    assert Transactions.query.count() == 3
+
+def test_conflicts_post_nothing(client, accounts, conflicts):
+    savings, checkings, other = accounts
+
+    conflicts[0] = CONFLICT_ATTEMPTS
+
+    response = post(client, [
+        {'op': 'deposit', 'acc_no': checkings, 'amt': 1},
+        {'op': 'transfer', 'acc_no': savings, 'transfer_no': checkings,
+         'amt': 1}])
+
+    assert response.status_code == 409
+    assert conflicts == [0]
+    assert bals(savings, checkings) == [1000, 0]
+    assert Transactions.query.count() == 0
@@ -0,0 +1,53 @@
+import pytest
+from website.models import Account
+from website.main.utils import create_acc, make_deposit
+
+@pytest.fixture
+def acc_no(app):
+    """An account for the admin user with a posting on it.
+
+    Returns:
+        int: The account number.
+    """    
+
+    create_acc('executive', bal=1000)
+    acc_no = Account.query.first().acc_no
+
+    make_deposit(acc_no, 100, 'Deposit')
+
+    return acc_no
+
+@pytest.mark.parametrize('url', ['/{}/account_graph_data/', 
+                                 '/{}/analytics_data/', 
+                                 '/{}/transactions/'])
+def test_not_modified_until_posting(client, acc_no, url):
+    url = url.format(acc_no)
+
+    response = client.get(url)
+    etag = response.headers['ETag']
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    # Repeats get an empty 304, also when a proxy weakened the tag.
+    for tag in (etag, 'W/' + etag, f'"other", {etag}'):
+        response = client.get(url, headers={'If-None-Match': tag})
+
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert response.headers['ETag'] == etag
+
+    # A different query string is a different response.
+    response = client.get(url + '?max_points=10', 
+                          headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+
+    # A posting changes the tag.
+    make_deposit(acc_no, 100, 'Deposit')
+
+    response = client.get(url, headers={'If-None-Match': 'W/' + etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_data()
@@ -0,0 +1,169 @@
+import csv
+import io
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+import pytest
+from website.models import Account
+from website.main.utils import create_acc, make_deposit, make_withdrawal
+from website.utils.format import to_dollar_str
+from harness import seed_ledger
+
+@pytest.fixture
+def acc_no(app):
+    """A checkings account for the admin user with a few postings.
+
+    Returns:
+        int: The account number.
+    """    
+
+    create_acc('executive', bal=0, acc_type=1)
+    acc_no = Account.query.first().acc_no
+
+    make_deposit(acc_no, 1250, 'Pay, "bonus"')
+    make_withdrawal(acc_no, 5, 'Fee & <tax>')
+    make_deposit(acc_no, 123450, 'A description longer than the name allows')
+
+    return acc_no
+
+@pytest.fixture
+def ledger(app):
+    """A savings account for the admin user with a transaction every twelve
+    hours from midnight on 2030-01-01 to noon on 2030-01-03.
+
+    Returns:
+        int: The account number.
+    """    
+
+    create_acc('executive', bal=1000)
+    acc_no = Account.query.first().acc_no
+
+    seed_ledger(acc_no, 6, start=datetime(2030, 1, 1),
+                every=timedelta(hours=12))
+
+    return acc_no
+
+def export_csv(client, acc_no, query=''):
+    """Download an account's CSV export.
+
+    Returns:
+        list[list[str]]: The rows, header first.
+    """    
+
+    response = client.get(f'/{acc_no}/export/{query}')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+
+    return list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+
+def export_ofx(client, acc_no, query=''):
+    """Download an account's OFX export.
+
+    Returns:
+        Element: The parsed statement.
+    """    
+
+    response = client.get(f'/{acc_no}/export/?format=ofx&{query}')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ofx'
+    assert response.headers['Content-Disposition'] == \
+        f'attachment; filename=account_{acc_no}.ofx'
+
+    return ET.fromstring(response.get_data())
+
+@pytest.mark.parametrize('cents, dollars', [
+    (0, '0.00'), (5, '0.05'), (-5, '-0.05'), (50, '0.50'), (1250, '12.50'),
+    (-100, '-1.00'), (123450, '1234.50'), (10 ** 15 + 1, '10000000000000.01')])
+def test_to_dollar_str(cents, dollars):
+    assert to_dollar_str(cents) == dollars
+
+def test_csv(client, acc_no):
+    header, *rows = export_csv(client, acc_no)
+
+    assert header == ['transaction_no', 'date', 'amount', 'start_bal',
+                      'end_bal', 'description']
+
+    # Amounts are exact with two decimals, withdrawals negative.
+    assert [row[2:] for row in rows] == [
+        ['12.50', '0.00', '12.50', 'Pay, "bonus"'],
+        ['-0.05', '12.50', '12.45', 'Fee & <tax>'],
+        ['1234.50', '12.45', '1246.95',
+         'A description longer than the name allows']]
+    assert [int(row[0]) for row in rows] == sorted(int(row[0]) for row in rows)
+    assert all(datetime.fromisoformat(row[1]) for row in rows)
+
+def test_ofx(client, acc_no):
+    statement = export_ofx(client, acc_no)
+
+    assert statement.findtext('.//ACCTID') == str(acc_no)
+    assert statement.findtext('.//ACCTTYPE') == 'CHECKING'
+
+    transactions = statement.findall('.//STMTTRN')
+
+    assert [(t.findtext('TRNTYPE'), t.findtext('TRNAMT'))
+            for t in transactions] == [
+        ('CREDIT', '12.50'), ('DEBIT', '-0.05'), ('CREDIT', '1234.50')]
+
+    # Escaped, and names are cut to the 32 characters OFX allows.
+    assert transactions[1].findtext('NAME') == 'Fee & <tax>'
+    assert transactions[2].findtext('NAME') == \
+        'A description longer than the na'
+    assert transactions[2].findtext('MEMO') == \
+        'A description longer than the name allows'
+    assert len({t.findtext('FITID') for t in transactions}) == 3
+
+    assert statement.findtext('.//LEDGERBAL/BALAMT') == '1246.95'
+
+@pytest.mark.parametrize('query, dates', [
+    ('', ['2030-01-01T00:00:00', '2030-01-01T12:00:00',
+          '2030-01-02T00:00:00', '2030-01-02T12:00:00',
+          '2030-01-03T00:00:00', '2030-01-03T12:00:00']),
+    # Both ends are whole days, from midnight and to the end of the day.
+    ('?from=2030-01-02', ['2030-01-02T00:00:00', '2030-01-02T12:00:00',
+                          '2030-01-03T00:00:00', '2030-01-03T12:00:00']),
+    ('?to=2030-01-02', ['2030-01-01T00:00:00', '2030-01-01T12:00:00',
+                        '2030-01-02T00:00:00', '2030-01-02T12:00:00']),
+    ('?from=2030-01-02&to=2030-01-02', ['2030-01-02T00:00:00',
+                                        '2030-01-02T12:00:00']),
+    ('?from=2030-01-04', []),
+    ('?from=2030-01-03&to=2030-01-02', [])])
+def test_csv_date_range(client, ledger, query, dates):
+    assert [row[1] for row in export_csv(client, ledger, query)[1:]] == dates
+
+def test_ofx_date_range(client, ledger):
+    statement = export_ofx(client, ledger, 'from=2030-01-02&to=2030-01-02')
+
+    assert statement.findtext('.//DTSTART') == '20300102000000'
+    assert statement.findtext('.//DTEND') == '20300103000000'
+    assert [t.findtext('DTPOSTED') for t in statement.findall('.//STMTTRN')] \
+        == ['20300102000000', '20300102120000']
+
+    # The balance after the last transaction in the range: 10.00 + 10.00
+    # - 5.01 + 10.02 - 5.03.
+    assert statement.findtext('.//LEDGERBAL/BALAMT') == '19.98'
+
+def test_ofx_empty_range(client, ledger):
+    statement = export_ofx(client, ledger, 'from=2029-01-01&to=2029-12-31')
+
+    # Nothing in the range, the balance is what the account opened with,
+    # before the transaction at midnight as the range ends.
+    assert statement.findall('.//STMTTRN') == []
+    assert statement.findtext('.//LEDGERBAL/BALAMT') == '10.00'
+
+@pytest.mark.parametrize('query, error', [
+    ('?format=pdf', 'Exports are csv or ofx.'),
+    ('?from=01-01-2030', 'The date range is malformed.'),
+    ('?to=2030-02-30', 'The date range is malformed.')])
+def test_malformed(client, acc_no, query, error):
+    response = client.get(f'/{acc_no}/export/{query}')
+
+    assert response.status_code == 400
+    assert response.json == {'error': error}
+
+def test_other_users_account(client, app):
+    create_acc('someone', bal=0)
+
+    response = client.get(f'/{Account.query.first().acc_no}/export/')
+
+    assert response.status_code == 302
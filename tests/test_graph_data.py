@@ -0,0 +1,156 @@
+import json
+import random
+import re
+import shutil
+import subprocess
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import pytest
+from website.models import Account
+from website.main.utils import create_acc
+from website.utils.utils import lttb
+from website.utils.format import compact_series, format_date_2
+from harness import seed_ledger
+
+ACCOUNT_GRAPH_JS = Path(__file__).parent.parent / 'website' / 'static' / \
+    'account_graph.js'
+
+def decode(series):
+    """Decode compact_series in python, the way decode_compact does.
+
+    Args:
+        series (dict): The compact series.
+
+    Returns:
+        tuple: The days and the balances in cents.
+    """    
+
+    days = []
+    day = date.fromisoformat(series['base']) if series['base'] else None
+
+    for step in series['days']:
+        day += timedelta(days=step)
+        days.append(day)
+
+    return days, series['cents']
+
+def decode_compact(series):
+    """Run decode_compact from account_graph.js under node.
+
+    Args:
+        series (dict): The compact series.
+
+    Returns:
+        list: The [label, dollars] points it decodes.
+    """    
+
+    source = ACCOUNT_GRAPH_JS.read_text()
+    function = re.search(r'^function decode_compact\(.*?^}$', source,
+                         re.M | re.S).group(0)
+
+    script = f'{function}\nconsole.log(JSON.stringify(' \
+             f'decode_compact({json.dumps(series)})));'
+
+    return json.loads(subprocess.run(['node', '-e', script], check=True,
+                                     capture_output=True, text=True).stdout)
+
+@pytest.mark.parametrize('threshold', [0, 1, 2])
+def test_lttb_small_threshold_keeps_everything(threshold):
+    assert lttb(list(range(10)), [0] * 10, threshold) == list(range(10))
+
+@pytest.mark.parametrize('n', [0, 1, 2, 3, 10])
+def test_lttb_short_series_kept(n):
+    assert lttb(list(range(n)), list(range(n)), 10) == list(range(n))
+
+@pytest.mark.parametrize('n, threshold', [(10, 3), (10, 9), (100, 7),
+                                          (1000, 1000 - 1), (1001, 250),
+                                          (3650, 1000)])
+def test_lttb_buckets(n, threshold):
+    generator = random.Random(n)
+    ys = [generator.randint(-1000, 1000) for _ in range(n)]
+
+    keep = lttb(list(range(n)), ys, threshold)
+
+    # The first and last points and one point from each bucket, in order.
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert keep == sorted(set(keep))
+
+    # The buckets split the points between the first and last evenly.
+    every = (n - 2) / (threshold - 2)
+    for i, kept in enumerate(keep[1:-1]):
+        assert int(i * every) + 1 <= kept < int((i + 1) * every) + 1
+
+def test_lttb_keeps_spikes():
+    ys = [100] * 1000
+    ys[123], ys[456], ys[789] = 5000, -5000, 2000
+
+    keep = lttb([x * 2.5 for x in range(1000)], ys, 20)
+
+    assert {123, 456, 789} <= set(keep)
+
+def test_compact_series_empty():
+    assert compact_series([], []) == {'base': None, 'days': [], 'cents': []}
+
+def test_compact_series_round_trip():
+    # Gaps, a leap day, the daylight savings changes and a year end.
+    days = [date(2024, 2, 27), date(2024, 2, 28), date(2024, 2, 29),
+            date(2024, 3, 1), date(2024, 3, 10), date(2024, 3, 11),
+            date(2024, 11, 3), date(2024, 12, 31), date(2025, 1, 1),
+            date(2027, 6, 15)]
+    cents = [0, 1, -1, 123456789, 5, 50, 500, 5000, 50000, 99]
+
+    series = compact_series(days, cents)
+
+    assert series['base'] == '2024-02-27'
+    assert series['days'][0] == 0
+    assert decode(series) == (days, cents)
+
+    # What the graph shows, labels and dollars as the default format has.
+    if not shutil.which('node'):
+        pytest.skip('node is needed to run decode_compact')
+
+    assert decode_compact(series) == [[format_date_2(day), bal / 100]
+                                      for day, bal in zip(days, cents)]
+
+@pytest.fixture
+def history(app):
+    """An account for the admin user with two years of daily postings, up
+    to yesterday.
+
+    Returns:
+        int: The account number.
+    """    
+
+    create_acc('executive', bal=1000)
+    acc_no = Account.query.first().acc_no
+
+    start = datetime.combine(date.today() - timedelta(days=730),
+                             datetime.min.time())
+    seed_ledger(acc_no, 730, start=start, every=timedelta(days=1))
+
+    return acc_no
+
+@pytest.mark.parametrize('max_points', [0, 3, 100, 1000])
+def test_graph_data_max_points(client, history, max_points):
+    data = client.get(
+        f'/{history}/account_graph_data/?max_points={max_points}').json
+
+    # Every past day when there are fewer than asked for, or with none.
+    assert len(data['points']) == min(max_points or 730, 730)
+    assert data['today'][0] == format_date_2(date.today())
+
+@pytest.mark.parametrize('max_points', [0, 3, 100])
+def test_graph_data_formats_agree(client, history, max_points):
+    url = f'/{history}/account_graph_data/?max_points={max_points}'
+
+    full = client.get(url).json
+    compact = client.get(url + '&format=compact').json
+
+    assert len(full['points']) == (max_points or 730)
+    assert compact['cursor'] == full['cursor']
+
+    days, cents = decode(compact)
+
+    assert [[format_date_2(day), bal / 100] for day, bal in
+            zip(days, cents)] == full['points'] + [full['today']]
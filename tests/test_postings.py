@@ -0,0 +1,110 @@
+import re
+from sqlalchemy import event
+from website import db
+from website.models import Account, Transactions
+from website.main.utils import create_acc
+from website.writer.commands import apply_command
+from harness import start_workers
+
+WORKERS = 4
+POSTINGS = 200
+
+# Little more than the minimum balance, so some withdrawals are refused.
+START = 600
+
+def postings(acc_no, n):
+    """Alternate deposits and withdrawals on one account.
+
+    Args:
+        acc_no (int): The account to post to.
+        n (int): How many postings.
+
+    Returns:
+        list[dict]: The commands for apply_command.
+    """    
+
+    return [{'op': 'deposit' if i % 2 else 'withdraw',
+             'args': {'acc_no': acc_no, 'amt': 100 + i,
+                      'description': 'Posting'}}
+            for i in range(n)]
+
+def test_concurrent_postings_lose_no_updates(app, tmp_path):
+    create_acc('executive', bal=START, min_bal=500)
+    acc_no = Account.query.first().acc_no
+
+    executor, futures = start_workers(
+        str(tmp_path), [postings(acc_no, POSTINGS)] * WORKERS)
+
+    with executor:
+        results = [future.result() for future in futures]
+
+    # Sum what each worker was told went through. Deposits always do, 
+    # withdrawals are refused (code '1') below the minimum balance.
+    expected = START
+    posted = 0
+    refused = 0
+    for codes in results:
+        for command, code in zip(postings(acc_no, POSTINGS), codes):
+            amt = command['args']['amt']
+
+            if command['op'] == 'deposit':
+                assert code == '1'
+                expected += amt
+                posted += 1
+
+            elif code == '2':
+                expected -= amt
+                posted += 1
+
+            else:
+                assert code == '1'
+                refused += 1
+
+    db.session.expire_all()
+    acc = Account.query.get(acc_no)
+
+    assert acc.bal == expected
+    assert acc.bal >= acc.min_bal
+    assert refused
+
+    # One transaction per posting that went through, each starting from the
+    # balance the one before left.
+    rows = Transactions.query.filter_by(acc_no=acc_no) \
+        .order_by(Transactions.transaction_no).all()
+
+    assert len(rows) == posted
+
+    bal = START
+    for row in rows:
+        assert row.start_bal == bal
+        bal = row.end_bal
+
+    assert bal == expected
+
+def test_posting_statement_count(app):
+    create_acc('executive', bal=10000)
+    acc_no = Account.query.first().acc_no
+
+    for op in ('deposit', 'withdraw'):
+        db.session.expunge_all()
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context,
+                   executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+
+        try:
+            apply_command({'op': op, 'args': {'acc_no': acc_no, 'amt': 100,
+                                              'description': 'Posting'}})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        # The guarded balance update, the transaction row and the daily
+        # balance rollup. No reads: the account isn't loaded first and the
+        # term comes from the cache.
+        assert [statement.split()[0] for statement in statements] == \
+            ['UPDATE', 'INSERT', 'INSERT']
+        assert re.search(r'WHERE .*account\.acc_no', statements[0])
@@ -0,0 +1,167 @@
+import re
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from website import db
+from website.models import Account
+from website.admin.pdf import Statement_Data
+from website.admin.utils import Admin_Tools
+from website.main.utils import create_acc, checkings_savings_retrieval, \
+    make_deposit, make_withdrawal, make_transfer, bulk_post, close_acc, \
+    daily_balances, balance_as_of, transaction_page, monthly_totals, \
+    search_transactions, export_rows, balance_timeline, apply_posting, \
+    set_shards
+
+# Tables a plan may scan. Curr_Term only ever holds one row.
+SCANNABLE = {'curr__term'}
+
+def query_plans(run):
+    """Run a function, then get the query plan of every statement it sent.
+
+    Args:
+        run (function): The function to run.
+
+    Returns:
+        list[tuple]: Each statement and the detail lines of its plan.
+    """    
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement,
+                           parameters[0] if executemany else parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    plans = []
+    with db.engine.connect() as conn:
+        # Explain through the driver, with the parameters exactly as sent.
+        cursor = conn.connection.dbapi_connection.cursor()
+
+        for statement, parameters in statements:
+            # Only statements that read tables, INSERT ... VALUES reads none.
+            if not re.match(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)',
+                            statement, re.I) or \
+                    re.search(r'\sVALUES\s', statement, re.I):
+                continue
+
+            plan = cursor.execute('EXPLAIN QUERY PLAN ' + statement,
+                                  parameters).fetchall()
+            plans.append((statement, [row[3] for row in plan]))
+
+    return plans
+
+def scans(plans):
+    """Find the plan lines that read a whole table.
+
+    Args:
+        plans (list[tuple]): Statements and plans from query_plans.
+
+    Returns:
+        list[tuple]: The statement and plan line of every table scan.
+    """    
+
+    found = []
+    for statement, lines in plans:
+        for line in lines:
+            match = re.match(r'SCAN (\w+)', line)
+
+            # Virtual tables (the full-text index) plan their own lookups, 
+            # a constant row is an empty IN list and anon_ a subquery's 
+            # rows, not tables.
+            if match and match.group(1) not in SCANNABLE and \
+                    not match.group(1).startswith('anon_') and \
+                    'VIRTUAL TABLE' not in line and \
+                    not line.startswith('SCAN CONSTANT ROW'):
+                found.append((statement, line))
+
+    return found
+
+@pytest.fixture
+def ledger(app):
+    """A few accounts with transactions spread over some days.
+
+    Returns:
+        tuple: The account numbers of a savings and a checkings account.
+    """    
+
+    create_acc('executive', bal=100000, min_bal=500, acc_type=0, apy=0.25)
+    create_acc('executive', bal=50000, acc_type=1)
+    create_acc('executive', bal=0, acc_type=1)
+
+    savings, checkings, spare = [acc.acc_no for acc in Account.query.all()]
+
+    for i in range(5):
+        make_deposit(savings, 1000, f'Deposit {i}')
+        make_withdrawal(checkings, 500, f'Rent {i}')
+
+    make_transfer(savings, checkings, 'Transfer', amt=2000)
+    db.session.commit()
+
+    close_acc(spare)
+
+    return savings, checkings
+
+# Each hot path, run against the ledger.
+HOT_PATHS = {
+    'checkings_savings_retrieval':
+        lambda s, c: checkings_savings_retrieval('executive'),
+    'make_deposit': lambda s, c: make_deposit(s, 100, 'Deposit'),
+    'make_withdrawal': lambda s, c: make_withdrawal(c, 100, 'Withdrawal'),
+    'make_transfer': lambda s, c: (make_transfer(s, c, 'Transfer', amt=100),
+                                   db.session.commit()),
+    'apply_posting': lambda s, c: (apply_posting(s, 100),
+                                   db.session.commit()),
+    'bulk_post': lambda s, c: bulk_post('executive', [
+        {'op': 'deposit', 'acc_no': s, 'amt': 1, 'description': 'a'},
+        {'op': 'transfer', 'acc_no': c, 'transfer_no': s, 'amt': 1}]),
+    'daily_balances': lambda s, c: list(daily_balances(s)),
+    'daily_balances_since': lambda s, c: list(
+        daily_balances(s, since=datetime.now().date() - timedelta(days=3))),
+    'daily_balances_hot': lambda s, c: (set_shards(c, 2), list(
+        daily_balances(c, since=datetime.now().date() - timedelta(days=3)))),
+    'set_shards_off': lambda s, c: set_shards(c, 0),
+    'balance_as_of': lambda s, c: balance_as_of(s, datetime.now()),
+    'transaction_page': lambda s, c: transaction_page(
+        s, 2, start=datetime.now() - timedelta(days=1), end=datetime.now()),
+    'transaction_page_cursor': lambda s, c: transaction_page(
+        s, 2, cursor=transaction_page(s, 2)[1]),
+    'monthly_totals': lambda s, c: monthly_totals(s),
+    'search_transactions':
+        lambda s, c: search_transactions('executive', 'rent', 10),
+    'export_rows': lambda s, c: list(export_rows(
+        s, start=datetime.now() - timedelta(days=1), end=datetime.now())),
+    'balance_timeline': lambda s, c: list(balance_timeline('executive')),
+    'compound_range': lambda s, c: (Admin_Tools.compound_range(s, s + 1),
+                                    db.session.commit()),
+    'commit_message':
+        lambda s, c: Admin_Tools.commit_message('Hello', 'executive'),
+    'statement_data': lambda s, c: Statement_Data('executive'),
+}
+
+@pytest.mark.parametrize('name', HOT_PATHS)
+def test_hot_path_uses_indexes(ledger, name):
+    plans = query_plans(lambda: HOT_PATHS[name](*ledger))
+
+    assert plans
+    assert scans(plans) == []
+
+@pytest.mark.parametrize('url', ['/{}/account_graph_data/',
+                                 '/{}/transactions/',
+                                 '/{}/analytics_data/',
+                                 '/{}/balance_as_of/?at=2030-01-01',
+                                 '/{}/export/?format=ofx',
+                                 '/search/?q=rent',
+                                 '/timeline/'])
+def test_hot_route_uses_indexes(ledger, client, url):
+    url = url.format(ledger[0])
+
+    plans = query_plans(lambda: client.get(url).get_data())
+
+    assert plans
+    assert scans(plans) == []
@@ -0,0 +1,93 @@
+import pytest
+from website import db
+from website.models import Account, Transactions
+from website.main.utils import create_acc, make_deposit
+from harness import make_app
+
+MESSAGE = 'This server is read-only, nothing was changed.'
+
+@pytest.fixture
+def replica(app, tmp_path):
+    """A client logged in as the admin user, on an app using the
+    readonly-replica profile over the test database. The admin user has
+    an account with a posting on it.
+
+    Returns:
+        tuple: The client and the account number.
+    """    
+
+    create_acc('executive', bal=1000)
+    create_acc('executive', bal=0, acc_type=1)
+    acc_no = Account.query.first().acc_no
+    make_deposit(acc_no, 100, 'Deposit')
+
+    replica = make_app(str(tmp_path), {'STORAGE_PROFILE': 'readonly-replica'})
+    replica.config['WTF_CSRF_ENABLED'] = False
+
+    client = replica.test_client()
+
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    return client, acc_no
+
+def state():
+    """Read what the write routes could change.
+
+    Returns:
+        tuple: The balance of each account and the number of accounts and
+        transactions.
+    """    
+
+    db.session.expire_all()
+
+    return ([acc.bal for acc in Account.query.all()],
+            Transactions.query.count())
+
+@pytest.mark.parametrize('method, url, data', [
+    ('post', '/{}/withdraw/', {'amt': '1', 'description': 'Rent'}),
+    ('post', '/{}/deposit/', {'amt': '1', 'description': 'Pay'}),
+    ('post', '/{}/transfer/', {'amt': '1', 'transfer_no': '{}'}),
+    ('post', '/{}/close_account/', {'password': 'password'}),
+    ('post', '/create_account/', {'acc_type': '1', 'balance': '1'}),
+    ('get', '/{}/withdraw/', None),
+    ('get', '/1/delete_messages/', None)])
+def test_write_routes_refused(replica, method, url, data):
+    client, acc_no = replica
+    before = state()
+
+    if data and 'transfer_no' in data:
+        data['transfer_no'] = str(acc_no + 1)
+
+    response = getattr(client, method)(url.format(acc_no), data=data)
+
+    # Sent back to the accounts, which still render, with the reason.
+    assert response.status_code == 302
+    assert response.location == '/accounts/'
+
+    response = client.get(response.location)
+
+    assert response.status_code == 200
+    assert MESSAGE in response.get_data(as_text=True)
+    assert state() == before
+
+def test_bulk_post_refused(replica):
+    client, acc_no = replica
+    before = state()
+
+    response = client.post('/bulk_post/', json={'postings': [
+        {'op': 'deposit', 'acc_no': acc_no, 'amt': 1}]})
+
+    assert response.status_code == 503
+    assert response.json == {'error': MESSAGE}
+    assert state() == before
+
+@pytest.mark.parametrize('url', ['/accounts/', '/{}/account_graph_data/',
+                                 '/{}/analytics_data/', '/{}/transactions/',
+                                 '/{}/balance_as_of/?at=2100-01-01',
+                                 '/search/?q=deposit', '/timeline/'])
+def test_read_routes_served(replica, url):
+    client, acc_no = replica
+
+    assert client.get(url.format(acc_no)).status_code == 200
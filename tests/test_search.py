@@ -0,0 +1,121 @@
+import pytest
+from website.models import Account
+from website.main.utils import create_acc, make_deposit, make_withdrawal, \
+    search_transactions
+
+@pytest.fixture
+def accounts(app):
+    """Two accounts for the admin user and one for someone else, with
+    transactions to search.
+
+    Returns:
+        tuple: The account numbers, the admin user's two then the other
+        user's.
+    """    
+
+    create_acc('executive', bal=100000)
+    create_acc('executive', bal=100000)
+    create_acc('someone', bal=100000)
+
+    mine, also_mine, theirs = [acc.acc_no for acc in Account.query.all()]
+
+    make_deposit(mine, 100, 'Coffee')
+    make_withdrawal(also_mine, 100, 'Coffee at the airport before a long '
+                                    'flight home for the holidays')
+    make_withdrawal(mine, 100, 'Rent')
+    make_deposit(also_mine, 100, 'Refund for coffee beans')
+    make_withdrawal(theirs, 100, 'Coffee')
+    make_withdrawal(mine, 100, 'Coffee')
+
+    return mine, also_mine, theirs
+
+def descriptions(rows):
+    """Get the description of each row.
+
+    Returns:
+        list[str]: The descriptions, in order.
+    """    
+
+    return [row.description for row in rows]
+
+def test_ranked_best_first(accounts):
+    rows, more = search_transactions('executive', 'coffee', 10)
+
+    # The shortest descriptions match best, equal matches newest first.
+    assert descriptions(rows) == [
+        'Coffee', 'Coffee', 'Refund for coffee beans',
+        'Coffee at the airport before a long flight home for the holidays']
+    assert rows[0].transaction_no > rows[1].transaction_no
+    assert not more
+
+def test_other_users_excluded(accounts):
+    mine, also_mine, theirs = accounts
+
+    rows, _ = search_transactions('executive', 'coffee', 10)
+
+    assert {row.acc_no for row in rows} == {mine, also_mine}
+
+    rows, _ = search_transactions('someone', 'coffee', 10)
+
+    assert [row.acc_no for row in rows] == [theirs]
+
+    assert search_transactions('nobody', 'coffee', 10) == ([], False)
+
+def test_every_word_required(accounts):
+    rows, _ = search_transactions('executive', 'coffee  AIRPORT', 10)
+
+    assert descriptions(rows) == [
+        'Coffee at the airport before a long flight home for the holidays']
+
+    assert search_transactions('executive', 'coffee rent', 10) == ([], False)
+
+def test_pages(accounts):
+    every, _ = search_transactions('executive', 'coffee', 10)
+
+    pages = [search_transactions('executive', 'coffee', 3, page=page)
+             for page in range(3)]
+
+    assert [len(rows) for rows, _ in pages] == [3, 1, 0]
+    assert [more for _, more in pages] == [True, False, False]
+    assert [row for rows, _ in pages for row in rows] == every
+
+    # A page exactly filled by the last matches has nothing after it.
+    assert search_transactions('executive', 'coffee', 2, page=1)[1] is False
+
+@pytest.mark.parametrize('text, found', [
+    ('rent)', ['Rent']), ('-rent', ['Rent']), ('rent^', ['Rent']),
+    ('"rent"', ['Rent']), ('"', []), ('coffee OR rent', []), ('cof*', []),
+    ('NEAR(rent', []), ('description:rent', [])])
+def test_query_syntax_is_text(accounts, text, found):
+    # Nothing typed is read as FTS5 syntax or raises. Every word, OR
+    # included, has to appear, and punctuation within a word makes it a
+    # phrase ("near rent").
+    rows, _ = search_transactions('executive', text, 10)
+
+    assert descriptions(rows) == found
+
+def test_route(client, accounts):
+    client.application.config['HISTORY_PAGE_SIZE'] = 3
+
+    response = client.get('/search/?q=coffee')
+
+    assert response.status_code == 200
+    assert response.json['next'] == 1
+    assert [result['description'] for result in response.json['results']] \
+        == ['Coffee', 'Coffee', 'Refund for coffee beans']
+
+    # The newest, the withdrawal.
+    assert response.json['results'][0]['amt'] == 1.0
+    assert response.json['results'][0]['withdrawal_deposit'] is False
+
+    response = client.get('/search/?q=coffee&page=1')
+
+    assert response.json['next'] is None
+    assert len(response.json['results']) == 1
+
+@pytest.mark.parametrize('url', ['/search/', '/search/?q=', '/search/?q=%20'])
+def test_route_nothing_to_search(client, accounts, url):
+    response = client.get(url)
+
+    assert response.status_code == 400
+    assert response.json == {'error': 'Enter something to search for.'}
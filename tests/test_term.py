@@ -0,0 +1,78 @@
+import time
+from website import db
+from website.models import Account, Transactions, Term_Data
+from website.admin.utils import Admin_Tools
+from website.main.utils import create_acc
+from website.utils.term_cache import current_term
+from harness import start_workers
+
+WORKERS = 4
+POSTINGS = 150
+ROLLOVERS = 5
+
+def last_transaction_no():
+    """Get the number of the latest committed transaction, in a fresh 
+    transaction.
+
+    Returns:
+        int: The transaction number, 0 if there are none.
+    """    
+
+    db.session.rollback()
+
+    return db.session.query(db.func.max(Transactions.transaction_no)) \
+        .scalar() or 0
+
+def test_no_posting_records_a_stale_term(app, tmp_path):
+    for _ in range(WORKERS):
+        create_acc('executive', bal=100000)
+
+    acc_nos = [acc.acc_no for acc in Account.query.all()]
+
+    executor, futures = start_workers(str(tmp_path), [
+        [{'op': 'deposit' if i % 2 else 'withdraw', 
+          'args': {'acc_no': acc_no, 'amt': 1, 'description': 'Posting'}} 
+         for i in range(POSTINGS)] 
+        for acc_no in acc_nos])
+
+    # Roll the term over while the workers are posting, noting the last 
+    # transaction committed before and after each rollover.
+    bounds = []
+    with executor:
+        while not last_transaction_no() and \
+                not any(future.done() for future in futures):
+            time.sleep(0.01)
+
+        for _ in range(ROLLOVERS):
+            before = last_transaction_no()
+            Admin_Tools.inc_term()
+            bounds.append((before, last_transaction_no(), current_term()))
+
+            time.sleep(0.05)
+
+        results = [future.result() for future in futures]
+
+    assert all(code in ('1', '2') for codes in results for code in codes)
+
+    db.session.rollback()
+    terms = [term for term, in db.session.execute(
+        db.select(Transactions.term).order_by(Transactions.transaction_no))]
+
+    assert len(terms) == WORKERS * POSTINGS
+
+    # Postings commit in transaction number order, so their terms never go 
+    # back.
+    assert terms == sorted(terms)
+
+    # Everything committed before a rollover has the old term and everything 
+    # committed after it the new one.
+    for before, after, term in bounds:
+        assert all(t < term for t in terms[:before])
+        assert all(t >= term for t in terms[after:])
+
+    # The rollovers happened while postings were still coming in.
+    assert len(set(terms)) > 1
+
+    # Each rollover recorded every account's starting balance.
+    assert Term_Data.query.filter_by(term=current_term()).count() == \
+        len(acc_nos)
@@ -0,0 +1,71 @@
+from website import db
+from website.models import Account, Transactions
+from website.main.utils import create_acc
+from harness import start_workers
+
+WORKERS = 6
+TRANSFERS = 100
+
+def transfers(acc_no, transfer_no, n):
+    """Transfers from one account to another.
+
+    Args:
+        acc_no (int): The account to transfer from.
+        transfer_no (int): The account to transfer to.
+        n (int): How many transfers.
+
+    Returns:
+        list[dict]: The commands for apply_command.
+    """    
+
+    return [{'op': 'transfer',
+             'args': {'acc_no': acc_no, 'transfer_no': transfer_no,
+                      'amt': 100 + i % 7, 'description': 'Transfer'}}
+            for i in range(n)]
+
+def test_opposing_transfers(app, tmp_path, record_property):
+    create_acc('executive', bal=1000000)
+    create_acc('executive', bal=1000000)
+    a, b = [acc.acc_no for acc in Account.query.all()]
+
+    # Half the workers send A to B, the other half B to A.
+    executor, futures = start_workers(str(tmp_path), [
+        transfers(a, b, TRANSFERS) if i % 2 else transfers(b, a, TRANSFERS)
+        for i in range(WORKERS)])
+
+    with executor:
+        # A worker that hit an error (e.g. database locked) raises here.
+        results = [future.result() for future in futures]
+
+    failures = sum(code != '5' for codes in results for code in codes)
+
+    # Throughput from the first transfer to the last, leaving out the time 
+    # the workers took to start.
+    db.session.expire_all()
+    first, last = db.session.execute(db.select(
+        db.func.min(Transactions.date), db.func.max(Transactions.date))).one()
+
+    record_property('transfers', WORKERS * TRANSFERS)
+    record_property('failures', failures)
+    record_property('transfers_per_second', 
+                    WORKERS * TRANSFERS / (last - first).total_seconds())
+
+    assert failures == 0
+
+    # Money only moved between the two accounts.
+    assert Account.query.get(a).bal + Account.query.get(b).bal == 2000000
+
+    # Both sides of every transfer were written, and each account's
+    # transactions chain from one balance to the next.
+    for acc_no in (a, b):
+        rows = Transactions.query.filter_by(acc_no=acc_no) \
+            .order_by(Transactions.transaction_no).all()
+
+        assert len(rows) == WORKERS * TRANSFERS
+
+        bal = 1000000
+        for row in rows:
+            assert row.start_bal == bal
+            bal = row.end_bal
+
+        assert bal == Account.query.get(acc_no).bal
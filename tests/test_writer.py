@@ -0,0 +1,125 @@
+import threading
+from pathlib import Path
+import pytest
+from website import db
+from website.models import Account, Transactions
+from website.main.utils import create_acc
+from website.writer import submit
+from website.writer.commands import UNKNOWN
+from website.writer.server import Writer_Server
+from harness import start_writer
+
+@pytest.fixture
+def writer(app):
+    """The writer, running on threads, with postings submitted to it.
+
+    Yields:
+        Writer_Server: The writer's server.
+    """    
+
+    app.config['POSTING_MODE'] = 'writer'
+
+    server = start_writer(app)
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def acc_no(app):
+    """An account for the admin user.
+
+    Returns:
+        int: The account number.
+    """    
+
+    create_acc('executive', bal=1000, min_bal=500)
+
+    return Account.query.first().acc_no
+
+def test_postings_through_writer(writer, acc_no):
+    assert submit('deposit', acc_no=acc_no, amt=100, 
+                  description='Deposit') == '1'
+    assert submit('withdraw', acc_no=acc_no, amt=1000, 
+                  description='Withdrawal') == '1'
+    assert submit('withdraw', acc_no=acc_no, amt=600, 
+                  description='Withdrawal') == '2'
+    assert submit('deposit', acc_no=999999, amt=100, 
+                  description='Deposit') == '0'
+
+    db.session.expire_all()
+
+    assert Account.query.get(acc_no).bal == 500
+    assert Transactions.query.count() == 2
+
+def test_failing_command_is_unknown(writer, acc_no):
+    # Raises in its group and again on its own, it is reported as maybe not 
+    # processed rather than as a missing account.
+    assert submit('deposit', acc_no=acc_no, amt='lots', 
+                  description='Deposit') == UNKNOWN['deposit']
+    assert submit('transfer', acc_no=acc_no, transfer_no=acc_no, 
+                  amt='lots', description='Transfer') == UNKNOWN['transfer']
+
+    # The writer carries on.
+    assert submit('deposit', acc_no=acc_no, amt=100, 
+                  description='Deposit') == '1'
+
+    db.session.expire_all()
+
+    assert Account.query.get(acc_no).bal == 1100
+    assert Transactions.query.count() == 1
+
+def test_group_with_failing_command(app, acc_no):
+    server = Writer_Server(app, Path(app.config['WRITER_SOCKET']))
+
+    # Record the size of each group the writer applies.
+    groups = []
+    next_group = server.next_group
+
+    def recorded_group():
+        group = next_group()
+        groups.append(len(group))
+        return group
+
+    server.next_group = recorded_group
+
+    commands = [
+        {'op': 'deposit', 
+         'args': {'acc_no': acc_no, 'amt': 100, 'description': 'Deposit'}}, 
+        {'op': 'withdraw', 
+         'args': {'acc_no': acc_no, 'amt': 5000, 'description': 'Too much'}}, 
+        {'op': 'deposit', 
+         'args': {'acc_no': acc_no, 'amt': 'lots', 'description': 'Fails'}}, 
+        {'op': 'withdraw', 
+         'args': {'acc_no': acc_no, 'amt': 300, 'description': 'Rent'}}, 
+        {'op': 'deposit', 
+         'args': {'acc_no': 999999, 'amt': 100, 'description': 'Missing'}}]
+
+    # Queue every command before the writer starts, so they arrive as one 
+    # group.
+    pending = [{'command': command, 'done': threading.Event()} 
+               for command in commands]
+
+    for command in pending:
+        server.commands.put(command)
+
+    threading.Thread(target=server.apply_commands, daemon=True).start()
+
+    for command in pending:
+        assert command['done'].wait(10)
+
+    server.server_close()
+
+    assert groups[0] == len(commands)
+
+    # Each caller gets the code for their own command, the failing one 
+    # doesn't stop the others being written.
+    assert [command['flash_code'] for command in pending] == \
+        ['1', '1', UNKNOWN['deposit'], '2', '0']
+
+    db.session.expire_all()
+
+    assert Account.query.get(acc_no).bal == 800
+    assert [row.description for row in Transactions.query.order_by(
+        Transactions.transaction_no)] == ['Deposit', 'Rent']
@@ -4,6 +4,7 @@ from flask_sqlalchemy import SQLAlchemy
 import json
 import os
 from pathlib import Path
+from website.utils.storage import engine_options, apply_pragmas, read_only
 
 # Initialize the login manager and Sqlalchemy database.
 db = SQLAlchemy()
@@ -12,10 +13,14 @@ login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 login_manager.login_message_category = "danger"
 
-def create_app():
+def create_app(test_config=None):
     """Create the instance of our flask app, setting up relevant 
     configurations, login manager, database uri, and flask blueprints.
 
+    Args:
+        test_config (dict, optional): Values replacing those from 
+        app_config.json, e.g. a scratch database for tests. Defaults to None.
+
     Returns:
         Flask: The flask app instance that is created.
     """    
@@ -29,12 +34,45 @@ def create_app():
     config = json.load(cf)
     cf.close()
 
+    if test_config:
+        config.update(test_config)
+
     # Initialize secret key in app config.
     app.config['SECRET_KEY'] = config['SECRET_KEY']
 
     # Initialize sqlalchemy database uri in app config.
     app.config['SQLALCHEMY_DATABASE_URI'] = config['SQLALCHEMY_DATABASE_URI']
 
+    # Pick the storage profile, which sets engine options (pool sizes) and 
+    # the pragmas run on each SQLite connection.
+    profile = config['STORAGE_PROFILES'][config['STORAGE_PROFILE']]
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(profile)
+
+    # Read-only profiles skip the caches GET requests would otherwise write.
+    app.config['READ_ONLY'] = read_only(profile)
+
+    # Postings are applied by this worker ('direct') or sent to the writer 
+    # process ('writer'), see website/writer.
+    app.config['POSTING_MODE'] = config['POSTING_MODE']
+    app.config['WRITER_SOCKET'] = config['WRITER_SOCKET']
+    app.config['WRITER_TIMEOUT'] = config['WRITER_TIMEOUT']
+
+    # How long the writer waits to gather postings into one commit.
+    app.config['GROUP_COMMIT_WINDOW_MS'] = config['GROUP_COMMIT_WINDOW_MS']
+
+    # File replaced on every term change so workers reload their cached term.
+    app.config['TERM_STAMP'] = config['TERM_STAMP']
+
+    # Most points the graph endpoint sends when the client doesn't ask.
+    app.config['GRAPH_MAX_POINTS'] = config['GRAPH_MAX_POINTS']
+
+    # How many transactions a page of the transaction history api holds.
+    app.config['HISTORY_PAGE_SIZE'] = config['HISTORY_PAGE_SIZE']
+
+    # How many account numbers end of term compounding commits at a time, 0 
+    # compounds every account in one transaction.
+    app.config['COMPOUND_CHUNK'] = config['COMPOUND_CHUNK']
+
     # Loads app error codes.
     flash_config = open(str(app.config['PROJECT_ROOT'] / Path('configs/flash_codes.json')), 'r')
     app.config['FLASH_CODES'] = json.load(flash_config)
@@ -44,6 +82,9 @@ def create_app():
     db.init_app(app=app)
     login_manager.init_app(app=app)
 
+    with app.app_context():
+        apply_pragmas(db.engine, profile)
+
     # Create authorization blueprint
     from website.auth.routes import auth
     app.register_blueprint(auth)
@@ -1,6 +1,8 @@
 from pathlib import Path
 from fpdf import FPDF
-from website.models import Transactions, Curr_Term, User, Account, Term_Data
+from website.models import Transactions, User, Account, Term_Data, db
+from website.utils.term_cache import current_term
+from sqlalchemy import select, func
 from website.utils.format import format_acc_no, format_date_3, format_date_4, format_money, \
     format_statement_filename
 from datetime import date
@@ -35,14 +37,16 @@ class Account_Metrics():
         self.transactions = Transactions.query.filter_by(
             acc_no=self.acc_no, term=term).all()
 
-        # Get the total amount withdrawed and deposited over this period.
-        self.withdrawal_total = 0.0
-        self.deposit_total = 0.0
-        for transaction in self.transactions:
-            if transaction.withdrawal_deposit:
-                self.deposit_total += transaction.amt
-            else:
-                self.withdrawal_total += transaction.amt
+        # Get the total amount withdrawed and deposited over this period, 
+        # summed by the database.
+        totals = dict(db.session.execute(
+            select(Transactions.withdrawal_deposit, func.sum(Transactions.amt))
+            .where(Transactions.acc_no == self.acc_no, 
+                   Transactions.term == term)
+            .group_by(Transactions.withdrawal_deposit)).all())
+
+        self.withdrawal_total = totals.get(False, 0)
+        self.deposit_total = totals.get(True, 0)
 
         # Format those amounts.
         self.withdrawal_total = format_money(self.withdrawal_total)
@@ -70,27 +74,25 @@ class Statement_Data():
         self.name = User.query.filter_by(username=username).first().name
 
         # Get what term this is.
-        self.term = Curr_Term.query.all()[0].term
+        self.term = current_term()
 
         # Get all accounts associated with user.
         self.accounts = Account.query.filter_by(username=username).all()
 
         # Get the total amount saved in all checkings and 
-        # savings for this user.
-        self.savings_total = 0.0
-        self.checkings_total = 0.0
+        # savings for this user, summed by the database.
+        totals = dict(db.session.execute(
+            select(Account.acc_type, func.sum(Account.bal))
+            .where(Account.username == username)
+            .group_by(Account.acc_type)).all())
 
-        # Get account metrics object for each account.
-        self.acc_metrics = {}
+        self.savings_total = totals.get(0, 0)
+        self.checkings_total = totals.get(1, 0)
 
-        # Iterate over accounts at the same time to get the 3 
-        # above data points. Map account number to the account metrics object.
+        # Get account metrics object for each account. Map account number 
+        # to the account metrics object.
+        self.acc_metrics = {}
         for acc in self.accounts:
-            if acc.acc_type == 0:
-                self.savings_total += acc.bal
-            elif acc.acc_type == 1:
-                self.checkings_total += acc.bal
-
             self.acc_metrics[acc.acc_no] = Account_Metrics(acc, self.term)
 
         # Format totals into monetary strings.
@@ -1,10 +1,11 @@
 from website.models import Bank_Settings, db
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, current_app
 from flask_login import login_required
-from website.utils.format import format_rates
+from website.utils.format import format_rates, to_cents, to_dollars
 from website.admin.forms import BankSettingsForm, SendAlertForm, SendMessageForm
 from website.utils.flash_codes import flash_codes
 from website.admin.utils import Admin_Tools, admin_only
+from website.main.utils import balance_as_of, parse_as_of
 
 # Create the admin blueprint to be used for privelged actions.
 admin = Blueprint('admin', __name__)
@@ -34,9 +35,9 @@ def bank_settings():
         elif change_type == 1:
             old_rates.checkings_apy = form.new_value.data
         elif change_type == 2:
-            old_rates.savings_min = form.new_value.data
+            old_rates.savings_min = to_cents(form.new_value.data)
         elif change_type == 3:
-            old_rates.checkings_min = form.new_value.data
+            old_rates.checkings_min = to_cents(form.new_value.data)
 
         db.session.commit()
 
@@ -46,6 +47,39 @@ def bank_settings():
     return render_template('bank_settings.html', form=form, rates=settings)
 
 
+@admin.route('/admin/<int:acc_no>/balance_as_of/')
+@login_required
+@admin_only
+def balance_as_of_route(acc_no):
+    """An admin only endpoint with the balance any account had at a point in 
+    time, given by the "at" query parameter (YYYY-MM-DD for the end of that 
+    day, or an ISO datetime). See balance_as_of.
+
+    Args:
+        acc_no (int): The account number to get the balance for.
+
+    Returns:
+        dict/tuple: A dictionary mapping "at" to the point in time and 
+        "bal" to the balance in dollars. A 400 is returned if the time is 
+        malformed and a 404 if the account does not exist.
+    """    
+
+    flash_code_map = current_app.config['FLASH_CODES']
+
+    try:
+        at = parse_as_of(request.args.get('at', ''))
+
+    except ValueError:
+        return {'error': flash_code_map['balance_as_of']['0'][0]}, 400
+
+    bal = balance_as_of(acc_no, at)
+
+    if bal is None:
+        return {'error': flash_code_map['balance_as_of']['1'][0]}, 404
+
+    return {'at': at.isoformat(), 'bal': to_dollars(bal)}
+
+
 @admin.route('/send_alert/', methods=['POST', 'GET'])
 @login_required
 @admin_only
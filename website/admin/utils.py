@@ -1,13 +1,16 @@
 from website.models import User, Account, Alerts, Messages, Bank_Settings, \
-    Statements, Term_Data, Curr_Term, Transactions
+    Statements, Term_Data, Curr_Term, Transactions, Balance_Data
 from datetime import datetime, date
+from sqlalchemy import select, insert, update, delete, func, literal, cast
 from website.admin.pdf import Statement_Maker
 from website import db
+from website.utils.term_cache import invalidate_term
+from website.main.utils import bal_data_backfill, dialect_insert
 from website.utils.utils import term_interest
 from wtforms.validators import ValidationError
 from website.utils.flash_codes import flash_codes
 from functools import wraps
-from flask import redirect, url_for
+from flask import redirect, url_for, current_app
 from flask_login import current_user
 
 def admin_only(f):
@@ -83,52 +86,81 @@ class Admin_Tools():
         db.session.commit()
 
 
-    def compound_acc(acc):
-        """Compound the balance on an account, this should be 
-        activated at end of term. Also stores the transaction.
+    def compound_range(lo, hi):
+        """Compound every open account with an account number in [lo, hi) 
+        with set-based statements: 
+        one INSERT ... SELECT writes the dividend transactions, one UPDATE 
+        pays them and one more writes the day's balances to Balance_Data. 
+        The caller commits.
 
         Args:
-            acc (Account): The account to modify with new balances.
+            lo (int): The first account number to compound.
+            hi (int): The account number to stop before.
         """        
 
-        # Get the current term.
-        term = Curr_Term.query.first().term
-
-        # Get the interest rate for the term. Term = 1 week, to keep things 
-        # simple we assume exactly 52 weeks in the year, i.e don't account 
-        # for leap years, or extra days in the 52nd week.
-        dividends = acc.bal * term_interest(acc.apy)
-
-        # Create the account transaction.
-        transaction = Transactions(acc_no=acc.acc_no, term=term, 
-                                   start_bal=acc.bal, 
-                                   end_bal=acc.bal + dividends, 
-                                   date=datetime.now(), amt=dividends, 
-                                   withdrawal_deposit=True, 
-                                   description='Dividend deposit.')
-
-        # Add the calculated dividends to the balance.
-        acc.bal += dividends
-        
-        # Add the transaction to session.
-        db.session.add(transaction)
-
-        # Commit.
-        db.session.commit()
+        in_range = (Account.status == True, Account.acc_no >= lo, 
+                    Account.acc_no < hi)
+
+        # The term's interest, balance * term_interest(apy), in whole cents 
+        # with half cents rounded away from zero. The cast keeps PostgreSQL 
+        # from rounding a float half to even.
+        dividend = cast(func.round(cast(
+            Account.bal * term_interest(Account.apy), db.Numeric)), db.Integer)
+
+        # Read by the statement itself, which holds the write lock by then, 
+        # rather than looked up before it (see current_term).
+        term = select(Curr_Term.term).limit(1).scalar_subquery()
+
+        now = datetime.now()
+
+        # Write the dividend transactions from the balances before they are 
+        # paid.
+        db.session.execute(insert(Transactions).from_select(
+            ['acc_no', 'term', 'start_bal', 'end_bal', 'date', 'amt', 
+             'withdrawal_deposit', 'description'], 
+            select(Account.acc_no, term, Account.bal, 
+                   Account.bal + dividend, literal(now, db.DateTime), 
+                   dividend, literal(True), literal('Dividend deposit.'))
+            .where(*in_range)))
+
+        # Pay them. A hot account's dividend goes to its base balance, its 
+        # shards are left alone.
+        db.session.execute(update(Account).where(*in_range).values(
+            {Account.base_bal: Account.base_bal + dividend, 
+             Account.version: Account.version + 1}))
+
+        # Record the new balances for today, hot accounts have no daily 
+        # rollup (see record_bal_data).
+        stmt = dialect_insert(Balance_Data).from_select(
+            ['acc_no', 'date', 'bal'], 
+            select(Account.acc_no, literal(now.date(), db.Date), Account.bal)
+            .where(*in_range, Account.shards == 0))
+        stmt = stmt.on_conflict_do_update(index_elements=['acc_no', 'date'], 
+                                          set_={'bal': stmt.excluded.bal})
+
+        db.session.execute(stmt)
 
 
     def commit_all_compound():
         """
-        Compounds the value on all accounts. Activate at end of term.
+        Compounds the value on all open accounts. Activate at end of term. 
+        Accounts are compounded and committed COMPOUND_CHUNK account numbers 
+        at a time (all at once for 0), see compound_range.
         """    
 
-        # Get all the accounts.    
-        accs = Account.query.all()
+        lo, hi = db.session.execute(
+            select(func.min(Account.acc_no), func.max(Account.acc_no))).one()
+
+        # No accounts.
+        if lo is None:
+            return
 
-        # Add compound interest to account balance for each account.
-        for acc in accs:
-            if acc.status:
-                Admin_Tools.compound_acc(acc)
+        step = current_app.config['COMPOUND_CHUNK'] or hi - lo + 1
+
+        for start in range(lo, hi + 1, step):
+            Admin_Tools.compound_range(start, start + step)
+
+            db.session.commit()
 
 
     def commit_alert(content):
@@ -208,69 +240,44 @@ class Admin_Tools():
             sm.write()
 
 
-#
-# Function no longer in use.
-#     def commit_bal_data(acc_no, date=date.today()):
-#         """Commit data on the current balance of this account to database.
-#
-#         Args:
-#             acc_no (int): The account number to commit balance data for.
-#             date (date, optional): A date object to store the time for which 
-#             this balance was taken. Defaults to date.today().
-#         """        
-# 
-#         # Get the account to commit account balance entry on.
-#         acc = Account.query.get(acc_no)
-#
-#         # Create Daily_Bal object to store current balance.
-#         bal_statement = Balance_Data(acc_no=acc_no, date=date, bal=acc.bal)
-# 
-#         # Add bal_statement to database and commit.
-#         db.session.add(bal_statement)
-#
-#         db.session.commit()
+    def rebuild_bal_data():
+        """
+        Rebuild the daily balance rollup from the transaction history. 
+        Postings keep it up to date, this backfills it, e.g. for 
+        transactions made before it existed.
+        """        
 
+        db.session.execute(delete(Balance_Data))
+        db.session.execute(bal_data_backfill())
 
-#
-# This function is no longer useful.
-#     def commit_all_bal_data():
-#         """
-#         Commit current balance to database.
-#         """        
-#
-#         # Get all accounts
-#         accounts = Account.query.all()
-# 
-#         # Enter daily_bal into database.
-#         for account in accounts:
-#             Admin_Tools.commit_bal_data(account.acc_no)
+        db.session.commit()
 
 
     def inc_term():
         """
-        Increment current term to next term.
+        Increment current term to next term, and record the starting 
+        balance of every account for the new term, closed ones included 
+        since statements still cover them. Both are written in 
+        one transaction, the term data with a single INSERT ... SELECT.
         """        
 
         # Get the current term and increment.
         term = Curr_Term.query.first()
         term.term += 1
 
-        db.session.commit()
-
-        # Get all accounts
-        accs = Account.query.all()
+        # Write the new term, taking the write lock.
+        db.session.flush()
 
-        # Create a new term data entry for all acounts.
-        for acc in accs:
+        # Create a new term data entry for all accounts.
+        db.session.execute(insert(Term_Data).from_select(
+            ['acc_no', 'term', 'start_bal'], 
+            select(Account.acc_no, literal(term.term), Account.bal)))
 
-            # Create the term data object.
-            new_term = Term_Data(acc_no=acc.acc_no, term=term.term, 
-                                 start_bal=acc.bal)
+        # Tell every worker to reload the term while we still hold the write 
+        # lock, see current_term.
+        invalidate_term()
 
-            # Add the term data object to session and commit.
-            db.session.add(new_term)
-
-            db.session.commit()
+        db.session.commit()
 
 #
 # Function no longer useful.
@@ -100,7 +100,8 @@ def signup():
 @auth.route('/logout')
 @login_required
 def logout():
-    """Logout the current user.
+    """Logout the current user, and clear what the browser stored for them 
+    (the account graph cache).
 
     Returns:
         response: A redirect response to the home page.
@@ -110,4 +111,7 @@ def logout():
 
     logout_user()
 
-    return redirect(url_for('main.home'))
\ No newline at end of file
+    response = redirect(url_for('main.home'))
+    response.headers['Clear-Site-Data'] = '"storage"'
+
+    return response
\ No newline at end of file
@@ -1,5 +1,6 @@
 from werkzeug.security import generate_password_hash
 from website import create_app, models
+from website.database.upgrade_db import stamp
 
 def setup():
     """
@@ -14,10 +15,11 @@ def setup():
         # Creates all tables
         models.db.create_all()
 
+        # Minimum balances are in cents.
         savings_apy = 0.25
-        savings_min = 5.0
+        savings_min = 500
         checkings_apy = 0.0
-        checkings_min = 0.0
+        checkings_min = 0
 
         # Creates the default bank settings.
         models.db.session.add(models.Bank_Settings(savings_apy=savings_apy,
@@ -35,5 +37,9 @@ def setup():
         # Commit to database
         models.db.session.commit()
 
+        # New databases already have the current schema.
+        with models.db.engine.begin() as conn:
+            stamp(conn)
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,216 @@
+from sqlalchemy import inspect, text
+from website import create_app, models
+from website.main.utils import bal_data_backfill
+
+def money_to_cents(conn):
+    """Rebuild the tables holding money so balances and amounts are stored 
+    as integer cents rather than floats. Existing values are rounded to the 
+    nearest cent.
+
+    Args:
+        conn (Connection): The connection to upgrade through.
+    """    
+
+    # Table model mapped to the columns that hold money.
+    money_columns = {
+        models.Account: ['bal', 'min_bal'],
+        models.Bank_Settings: ['savings_min', 'checkings_min'],
+        models.Transactions: ['amt', 'start_bal', 'end_bal'],
+        models.Term_Data: ['start_bal'],
+    }
+
+    for model, columns in money_columns.items():
+        table = model.__table__
+
+        # Copy only the columns the old table has, the current model may 
+        # have gained columns added by later upgrade steps.
+        old_names = {column['name'] for column in 
+                     inspect(conn).get_columns(table.name)}
+
+        # SQLite can't change a column type in place, so move the old table 
+        # aside, create the new one and copy the rows across.
+        conn.execute(text(
+            f'ALTER TABLE {table.name} RENAME TO _old_{table.name}'))
+        table.create(conn)
+
+        names, values = [], []
+        for column in table.columns:
+            if column.name in columns:
+                value = f'CAST(ROUND({column.name} * 100) AS INTEGER)'
+            elif column.name in old_names:
+                value = column.name
+            elif column.default is not None and column.default.is_scalar:
+                # Fill columns the old table lacks with their default.
+                value = repr(column.default.arg)
+            else:
+                continue
+
+            names.append(column.name)
+            values.append(value)
+
+        conn.execute(text(f'INSERT INTO {table.name} ({", ".join(names)}) '
+                          f'SELECT {", ".join(values)} FROM _old_{table.name}'))
+        conn.execute(text(f'DROP TABLE _old_{table.name}'))
+
+
+def create_indexes(conn, *names):
+    """Create indexes declared on the models, skipping any that exist.
+
+    Args:
+        conn (Connection): The connection to upgrade through.
+        *names (str): The names of the indexes to create.
+    """    
+
+    tables = models.db.metadata.tables.values()
+    indexes = {index.name: index for table in tables for index in table.indexes}
+
+    for name in names:
+        indexes[name].create(conn, checkfirst=True)
+
+def ledger_indexes(conn):
+    """Build the indexes the hot queries rely on.
+
+    Args:
+        conn (Connection): The connection to upgrade through.
+    """    
+
+    create_indexes(conn, 'ix_account_username', 'ix_messages_username', 
+                   'ix_transactions_acc_no_term', 
+                   'ix_statements_username_date', 'ix_term_data_acc_no_term')
+
+def account_version(conn):
+    """Add the version counter used for optimistic concurrency on Account.
+
+    Args:
+        conn (Connection): The connection to upgrade through.
+    """    
+
+    # The column is already there if the account table was rebuilt from 
+    # the current model by money_to_cents.
+    if 'version' in {column['name'] for column in 
+                     inspect(conn).get_columns('account')}:
+        return
+
+    conn.execute(text('ALTER TABLE account ADD COLUMN version INTEGER '
+                      'NOT NULL DEFAULT 1'))
+
+def account_shards(conn):
+    """Add the shard count on Account and the table holding the shards of 
+    hot accounts.
+
+    Args:
+        conn (Connection): The connection to upgrade through.
+    """    
+
+    models.Account_Shard.__table__.create(conn, checkfirst=True)
+
+    if 'shards' in {column['name'] for column in 
+                    inspect(conn).get_columns('account')}:
+        return
+
+    conn.execute(text('ALTER TABLE account ADD COLUMN shards INTEGER '
+                      'NOT NULL DEFAULT 0'))
+
+def history_index(conn):
+    """Build the index history is read through, in date order by account.
+
+    Args:
+        conn (Connection): The connection to upgrade through.
+    """    
+
+    create_indexes(conn, 'ix_transactions_acc_no_date')
+
+def balance_data(conn):
+    """Create the daily balance rollup and fill it from the existing 
+    transactions.
+
+    Args:
+        conn (Connection): The connection to upgrade through.
+    """    
+
+    models.Balance_Data.__table__.create(conn, checkfirst=True)
+
+    conn.execute(models.Balance_Data.__table__.delete())
+    conn.execute(bal_data_backfill())
+
+def monthly_totals(conn):
+    """Create the cache of closed months' deposit and withdrawal totals.
+
+    Args:
+        conn (Connection): The connection to upgrade through.
+    """    
+
+    models.Monthly_Totals.__table__.create(conn, checkfirst=True)
+
+def transactions_fts(conn):
+    """Create the full-text index over transaction descriptions, with the 
+    triggers keeping it in sync, and fill it from the existing transactions.
+
+    Args:
+        conn (Connection): The connection to upgrade through.
+    """    
+
+    for statement in models.TRANSACTIONS_FTS:
+        conn.exec_driver_sql(statement)
+
+    conn.exec_driver_sql(
+        "INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')")
+
+def transaction_dates(conn):
+    """Give transaction dates written by the CURRENT_TIMESTAMP default the 
+    microseconds every other date is stored with. Dates are compared as 
+    text, so without them a date sorts below the same time written from 
+    python and paging by (date, transaction_no) repeats rows.
+
+    Args:
+        conn (Connection): The connection to upgrade through.
+    """    
+
+    conn.execute(text("UPDATE transactions SET date = date || '.000000' "
+                      "WHERE date NOT LIKE '%.%'"))
+
+
+# Upgrade steps in the order they were added. The database stores how many 
+# have been applied in its user_version.
+UPGRADES = [money_to_cents, ledger_indexes, account_version, account_shards, 
+            history_index, balance_data, monthly_totals, transactions_fts, 
+            transaction_dates]
+
+def stamp(conn):
+    """Mark a freshly created database as having every upgrade applied.
+
+    Args:
+        conn (Connection): The connection to the new database.
+    """    
+
+    conn.execute(text(f'PRAGMA user_version = {len(UPGRADES)}'))
+
+def upgrade():
+    """
+    Apply any upgrade steps the database is missing, each in its own 
+    transaction.
+    """    
+
+    app = create_app()
+
+    with app.app_context():
+        engine = models.db.engine
+
+        # Nothing to upgrade on a database that hasn't been set up yet.
+        if not inspect(engine).has_table(models.Account.__tablename__):
+            return
+
+        with engine.connect() as conn:
+            version = conn.execute(text('PRAGMA user_version')).scalar()
+
+        for i in range(version, len(UPGRADES)):
+            with engine.begin() as conn:
+                # Start the transaction ourselves, the sqlite driver would 
+                # otherwise run schema changes outside of it.
+                conn.exec_driver_sql('BEGIN')
+
+                UPGRADES[i](conn)
+                conn.execute(text(f'PRAGMA user_version = {i + 1}'))
+
+if __name__ == '__main__':
+    upgrade()
@@ -1,19 +1,27 @@
-from flask import Blueprint, render_template, redirect, url_for, send_file
+from flask import Blueprint, render_template, redirect, url_for, send_file, \
+    request, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from website.models import Account, Bank_Settings, Messages, Statements, \
     Transactions, db
 from website.utils.format import format_acc_no, format_rates, \
-    deep_format_acc, format_date_3
+    deep_format_acc, format_date_2, format_date_3, format_money, to_cents, \
+    to_dollars, compact_series
 from werkzeug.security import check_password_hash
-from website.main.utils import make_withdrawal, make_deposit, \
-    checkings_savings_retrieval, transfer, create_acc, \
-    account_history, account_check
-from website.utils.utils import get_messages, get_alerts
+from website.main.utils import checkings_savings_retrieval, close_acc, \
+    create_acc, daily_balances, account_check, account_etag, bulk_post, \
+    writes_allowed, \
+    transaction_page, balance_timeline, balance_as_of, parse_as_of, \
+    monthly_totals, search_transactions, export_rows, export_csv, export_ofx
+from website.utils.utils import get_messages, get_alerts, lttb
 from pathlib import Path
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
+import json
+from datetime import datetime, date
 from website.main.forms import WithdrawalForm, DepositForm, \
     CreateAccountForm, CloseAccountForm, TransferForm
 from website.utils.flash_codes import flash_codes
-from website.main.utils import transfer
+from website.writer import submit
 
 # Create the main blueprint route
 main = Blueprint('main', __name__)
@@ -70,6 +78,7 @@ def view_accounts():
 
 @main.route('/create_account/', methods=['POST', 'GET'])
 @login_required
+@writes_allowed
 def create_account():
     """Renders the template used to create accounts and also takes input from 
     the form to create accounts when submitted.
@@ -97,15 +106,18 @@ def create_account():
             min_bal = rates.checkings_min
             apy = rates.checkings_apy
 
+        # Money is stored in cents.
+        balance = to_cents(form.balance.data)
+
         # Flash a message if the requested starting bal is smaller 
         # than the min bal allowed on the account.
-        if form.balance.data < min_bal:
+        if balance < min_bal:
             flash_codes(flash_code='0')
 
         # Ready for account creation.
         else:
             # Create account.
-            create_acc(username=current_user.username, bal=form.balance.data, 
+            create_acc(username=current_user.username, bal=balance, 
                        min_bal=min_bal, apy=apy, acc_type=form.acc_type.data)
 
             # Flash account creation message.
@@ -146,6 +158,7 @@ def summary():
 
 @main.route('/<int:acc_no>/withdraw/', methods=['GET', 'POST'])
 @login_required
+@writes_allowed
 @account_check
 def withdraw(acc_no):
     """A page with a form to withdraw money from the selected account.
@@ -165,9 +178,10 @@ def withdraw(acc_no):
     # Checks if the form has been validated and submitted.
     if form.validate_on_submit():
 
-        # Use make_withdrawal function to make a withdrawal from the account.
-        flash_code = make_withdrawal(acc_no=acc_no, amt=form.amt.data, 
-                                     description=form.description.data)
+        # Submit a withdrawal from the account (see make_withdrawal).
+        flash_code = submit('withdraw', acc_no=acc_no, 
+                            amt=to_cents(form.amt.data), 
+                            description=form.description.data)
 
         flash_codes(flash_code=flash_code)
 
@@ -180,6 +194,7 @@ def withdraw(acc_no):
 
 @main.route('/<int:acc_no>/deposit/', methods=['GET', 'POST'])
 @login_required
+@writes_allowed
 @account_check
 def deposit(acc_no):
     """A page with a form to deposit money into the selected account.
@@ -199,9 +214,10 @@ def deposit(acc_no):
     # Check if the form has been validated and submitted.
     if form.validate_on_submit():
 
-        # Make a deposit into the account.
-        flash_code = make_deposit(acc_no=acc_no, amt=form.amt.data, 
-                                        description=form.description.data)
+        # Submit a deposit into the account (see make_deposit).
+        flash_code = submit('deposit', acc_no=acc_no, 
+                            amt=to_cents(form.amt.data), 
+                            description=form.description.data)
 
         flash_codes(flash_code=flash_code)
 
@@ -215,6 +231,7 @@ def deposit(acc_no):
 
 @main.route('/<int:acc_no>/close_account/', methods=['GET', 'POST'])
 @login_required
+@writes_allowed
 @account_check
 def close_account(acc_no):
     """Delete the selected account, also has an option to transfer the balance on this account to another account.
@@ -238,24 +255,14 @@ def close_account(acc_no):
 
         # Check the entered password against the password hash.
         if check_password_hash(hash, form.password.data):
-            transfer_status = True
+            # Close the account, transferring all money to a different 
+            # account if one was given.
+            flash_code = close_acc(acc_no, form.transfer_no.data)
+
             if form.transfer_no.data:
-                # Transfer all money to a different account.
-                transfer_status = transfer(acc_no, form.transfer_no.data, 
-                                            description='Upon deletion of'
-                                                ' account ' + \
-                                                    format_acc_no(acc_no) +    
-                                                    ', funds transferred to'
-                                                        ' this account.', 
-                                                        deletion=True)
-            
-            if transfer_status:
-                acc = Account.query.get(acc_no)
-                acc.close()   
-
-                # Commit our changes made in functions.
-                db.session.commit()
+                flash_codes(flash_code=flash_code, caller='transfer')
 
+            if flash_code == '5':
                 flash_codes(flash_code='1')
 
                 # Return redirect response to view accounts.
@@ -319,6 +326,7 @@ def messages():
 
 @main.route('/<int:id>/delete_messages/')
 @login_required
+@writes_allowed
 @account_check
 def delete_message(id):
     """Delete the selected account.
@@ -407,16 +415,11 @@ def account_graph(acc_no):
         str: The rendered html string.
     """    
 
-    # The balance data.
-    data = Transactions.query.filter_by(acc_no=acc_no).all()
-
-
-    valid = False
-    
-    # If we have more than 1 data point we can display the graph at this 
+    # If we have at least 1 transaction we can display the graph at this 
     # point so we set valid to true. 
-    if len(data) >= 1:
-        valid = True
+    valid = db.session.execute(select(
+        select(Transactions.transaction_no)
+        .where(Transactions.acc_no == acc_no).exists())).scalar()
         
     # Pass this url to the html page so it can be given to javascript, 
     # this was javascript can access the account_graph_data endpoint.
@@ -430,27 +433,302 @@ def account_graph(acc_no):
 @main.route('/<int:acc_no>/account_graph_data/')
 @login_required
 @account_check
+@account_etag
 def account_graph_data(acc_no):
     """An endpoint to be used by javascript to retrieve balance data 
-    associated with the account. Data is serialized into json format.
+    associated with the account, one point per day (see daily_balances). 
+    Long histories are downsampled to at most the "max_points" query 
+    parameter, which defaults to GRAPH_MAX_POINTS, 0 sends every point. A 
+    "since" query parameter (YYYY-MM-DD, the cursor from an earlier 
+    response) only sends the days after it, so a client can keep the 
+    history it has and add to it. "format=compact" sends the points as 
+    columns instead, see compact_series. Data is serialized into json 
+    format.
 
     Args:
         acc_no (int): The account number to retrieve balance data for.
 
     Returns:
-        dict: A dictionary mapping "labels" to x values and "values" 
-        to y values.
+        dict/tuple: A dictionary mapping "points" to a list of [x, y] pairs 
+        for past days, "today" to the pair for today's balance, which can 
+        still change, and "cursor" to the last past day sent. Dates are 
+        labels and balances are in dollars. A 400 is returned if the since 
+        cursor is malformed. The compact format maps "base", "days" and 
+        "cents" to the points with today last, along with "cursor".
+    """    
+
+    max_points = request.args.get(
+        'max_points', current_app.config['GRAPH_MAX_POINTS'], type=int)
+
+    try:
+        since = request.args.get('since')
+        since = date.fromisoformat(since) if since else None
+
+    except ValueError:
+        flash_code_map = current_app.config['FLASH_CODES']
+        return {'error': flash_code_map['account_graph_data']['0'][0]}, 400
+
+    days, bals = [], []
+    for day, bal in daily_balances(acc_no, since=since):
+        days.append(day)
+        bals.append(bal)
+
+    # The last point is today's balance.
+    today, today_bal = days.pop(), bals.pop()
+
+    # Past days are final, clients continue from the last one.
+    cursor = days[-1] if days else since
+    cursor = cursor.isoformat() if cursor else None
+
+    # Keep the points that best preserve the shape of the graph.
+    keep = lttb([day.toordinal() for day in days], bals, max_points)
+
+    if request.args.get('format') == 'compact':
+        series = compact_series([days[i] for i in keep] + [today], 
+                                [bals[i] for i in keep] + [today_bal])
+        series['cursor'] = cursor
+
+        return series
+
+    return {"points": [[format_date_2(days[i]), to_dollars(bals[i])] 
+                       for i in keep], 
+            "today": [format_date_2(today), to_dollars(today_bal)], 
+            "cursor": cursor}
+
+
+@main.route('/<int:acc_no>/analytics/')
+@login_required
+@account_check
+def analytics(acc_no):
+    """Display the total deposited and withdrawn on the selected account 
+    each month.
+
+    Args:
+        acc_no (int): The selected account.
+
+    Returns:
+        str: The rendered html string.
+    """    
+
+    # Format the totals for each month, newest first.
+    months = [{'month': month, 'deposits': format_money(deposits), 
+               'withdrawals': format_money(withdrawals), 
+               'net': format_money(deposits - withdrawals)} 
+              for month, deposits, withdrawals in monthly_totals(acc_no)]
+
+    months.reverse()
+
+    return render_template('analytics.html', acc_no=format_acc_no(acc_no), 
+                           months=months)
+
+
+@main.route('/<int:acc_no>/analytics_data/')
+@login_required
+@account_check
+@account_etag
+def analytics_data(acc_no):
+    """An endpoint with the total deposited and withdrawn on the account 
+    each month, see monthly_totals. Data is serialized into json format.
+
+    Args:
+        acc_no (int): The account number to get totals for.
+
+    Returns:
+        dict: A dictionary mapping "months" to a list of dictionaries with 
+        the month (YYYY-MM), deposits and withdrawals in dollars, oldest 
+        first.
+    """    
+
+    return {'months': [{'month': month, 'deposits': to_dollars(deposits), 
+                        'withdrawals': to_dollars(withdrawals)} 
+                       for month, deposits, withdrawals 
+                       in monthly_totals(acc_no)]}
+
+
+@main.route('/<int:acc_no>/transactions/')
+@login_required
+@account_check
+@account_etag
+def transactions(acc_no):
+    """An endpoint to page through the transactions on an account, newest 
+    first. Optional "from" and "to" query parameters (YYYY-MM-DD) limit the 
+    date range, and "cursor" continues from the previous page.
+
+    Args:
+        acc_no (int): The account number to get transactions for.
+
+    Returns:
+        dict/tuple: A dictionary mapping "transactions" to the page and 
+        "next" to the cursor for the following page (null on the last 
+        page), amounts in dollars. A 400 is returned if the cursor or dates 
+        are malformed.
+    """    
+
+    try:
+        start, end = [datetime.strptime(request.args[arg], '%Y-%m-%d') 
+                      if request.args.get(arg) else None 
+                      for arg in ('from', 'to')]
+
+        rows, cursor = transaction_page(
+            acc_no, current_app.config['HISTORY_PAGE_SIZE'], start=start, 
+            end=end, cursor=request.args.get('cursor'))
+
+    except ValueError:
+        flash_code_map = current_app.config['FLASH_CODES']
+        return {'error': flash_code_map['transactions']['0'][0]}, 400
+
+    return {'transactions': [{'transaction_no': row.transaction_no, 
+                              'date': row.date.isoformat(), 
+                              'amt': to_dollars(row.amt), 
+                              'start_bal': to_dollars(row.start_bal), 
+                              'end_bal': to_dollars(row.end_bal), 
+                              'withdrawal_deposit': row.withdrawal_deposit, 
+                              'description': row.description, 
+                              'term': row.term} 
+                             for row in rows], 
+            'next': cursor}
+
+
+@main.route('/<int:acc_no>/export/')
+@login_required
+@account_check
+def export(acc_no):
+    """An endpoint to download an account's transactions, oldest first. 
+    "format" is csv (the default) or ofx, optional "from" and "to" query 
+    parameters (YYYY-MM-DD) limit the date range. The file is streamed as 
+    rows are read, see export_rows.
+
+    Args:
+        acc_no (int): The account number to export.
+
+    Returns:
+        response/tuple: The file as an attachment. A 400 is returned if the 
+        format or dates are malformed.
     """    
 
-    # Retrieve balance data.
-    labels, values = account_history(acc_no)
+    flash_code_map = current_app.config['FLASH_CODES']
+
+    fmt = request.args.get('format', 'csv')
+
+    if fmt not in ('csv', 'ofx'):
+        return {'error': flash_code_map['export']['1'][0]}, 400
+
+    try:
+        start, end = [datetime.strptime(request.args[arg], '%Y-%m-%d') 
+                      if request.args.get(arg) else None 
+                      for arg in ('from', 'to')]
+
+    except ValueError:
+        return {'error': flash_code_map['export']['0'][0]}, 400
 
-    # Return with "labels" and "values".
-    return {"labels": labels, "values": values}
+    rows = export_rows(acc_no, start=start, end=end)
+
+    if fmt == 'csv':
+        body = export_csv(rows)
+        mimetype = 'text/csv'
+
+    else:
+        body = export_ofx(Account.query.get(acc_no), rows, start, end)
+        mimetype = 'application/x-ofx'
+
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': 
+            f'attachment; filename=account_{acc_no}.{fmt}'})
+
+
+@main.route('/<int:acc_no>/balance_as_of/')
+@login_required
+@account_check
+def balance_as_of_route(acc_no):
+    """An endpoint with the balance an account had at a point in time, 
+    given by the "at" query parameter (YYYY-MM-DD for the end of that day, 
+    or an ISO datetime). See balance_as_of.
+
+    Args:
+        acc_no (int): The account number to get the balance for.
+
+    Returns:
+        dict/tuple: A dictionary mapping "at" to the point in time and 
+        "bal" to the balance in dollars. A 400 is returned if the time is 
+        malformed.
+    """    
+
+    try:
+        at = parse_as_of(request.args.get('at', ''))
+
+    except ValueError:
+        flash_code_map = current_app.config['FLASH_CODES']
+        return {'error': flash_code_map['balance_as_of']['0'][0]}, 400
+
+    return {'at': at.isoformat(), 
+            'bal': to_dollars(balance_as_of(acc_no, at))}
+
+
+@main.route('/search/')
+@login_required
+def search():
+    """An endpoint to search the descriptions of the current user's 
+    transactions, best matches first. "q" holds the words to search for and 
+    "page" which page of matches to return, from 0.
+
+    Returns:
+        dict/tuple: A dictionary mapping "results" to the matches, amounts in 
+        dollars, and "next" to the next page number (null on the last page). 
+        A 400 is returned if there is nothing to search for.
+    """    
+
+    text = request.args.get('q', '')
+    page = max(request.args.get('page', 0, type=int), 0)
+
+    if not text.strip():
+        flash_code_map = current_app.config['FLASH_CODES']
+        return {'error': flash_code_map['search']['0'][0]}, 400
+
+    rows, more = search_transactions(
+        current_user.username, text, current_app.config['HISTORY_PAGE_SIZE'], 
+        page=page)
+
+    return {'results': [{'transaction_no': row.transaction_no, 
+                         'acc_no': row.acc_no, 
+                         'date': row.date.isoformat(), 
+                         'amt': to_dollars(row.amt), 
+                         'withdrawal_deposit': row.withdrawal_deposit, 
+                         'description': row.description} 
+                        for row in rows], 
+            'next': page + 1 if more else None}
+
+
+@main.route('/timeline/')
+@login_required
+def timeline():
+    """An endpoint with the combined balance of all the current user's open 
+    accounts over time, see balance_timeline. Data is serialized into json 
+    format and streamed as it is read.
+
+    Returns:
+        response: Json mapping "events" to a list of [date, total, savings, 
+        checkings], dates in ISO format and balances in dollars.
+    """    
+
+    def generate():
+        yield '{"events": ['
+
+        # Write each event as the accounts' histories are merged.
+        for i, (dt, total, savings, checkings) in enumerate(
+                balance_timeline(current_user.username)):
+            yield (',' if i else '') + json.dumps(
+                [dt.isoformat(), to_dollars(total), to_dollars(savings), 
+                 to_dollars(checkings)])
+
+        yield ']}'
+
+    return Response(stream_with_context(generate()), 
+                    mimetype='application/json')
 
 
 @main.route('/<int:acc_no>/transfer/', methods=['GET', 'POST'])
 @login_required
+@writes_allowed
 @account_check
 def transfer_route(acc_no):
     """Transfer the amount requested from the account for this page to the 
@@ -471,16 +749,56 @@ def transfer_route(acc_no):
     # Check if we have a validated submission.
     if form.validate_on_submit():
 
-        # Attempt to transfer the requested amount.
-        transfer_status = transfer(acc_no=acc_no, 
-                              transfer_no=int(form.transfer_no.data), 
-                              description=str(form.description.data), 
-                              amt=float(form.amt.data))
+        # Attempt to transfer the requested amount (see make_transfer), 
+        # the transfer is committed if it succeeds.
+        flash_code = submit('transfer', acc_no=acc_no, 
+                            transfer_no=int(form.transfer_no.data), 
+                            description=str(form.description.data), 
+                            amt=to_cents(form.amt.data))
+
+        flash_codes(flash_code=flash_code, caller='transfer')
         
-        # If transfer is succesful commit session and redirect to 
-        # main.view_accounts.
-        if transfer_status:
-            db.session.commit()
+        # If transfer is succesful redirect to main.view_accounts.
+        if flash_code == '5':
             return redirect(url_for('main.view_accounts'))
 
-    return render_template('transfer.html', form=form)
\ No newline at end of file
+    return render_template('transfer.html', form=form)
+
+
+@main.route('/bulk_post/', methods=['POST'])
+@login_required
+def bulk_post_route():
+    """Post a batch of deposits, withdrawals and transfers across the current 
+    user's accounts in one request. The body is json with a "postings" list, 
+    see bulk_post.
+
+    Returns:
+        dict/tuple: A dictionary mapping "results" to the flash code and 
+        message for each posting, in order. If balances kept changing while 
+        the batch was processed (and retried) nothing is posted and a 409 is 
+        returned, through a read-only database a 503.
+    """    
+
+    flash_code_map = current_app.config['FLASH_CODES']
+
+    # Nothing can be posted through a read-only database.
+    if current_app.config['READ_ONLY']:
+        return {'error': flash_code_map['read_only']['0'][0]}, 503
+
+    body = request.get_json(silent=True)
+    postings = body.get('postings') if isinstance(body, dict) else None
+
+    if not isinstance(postings, list):
+        return {'error': flash_code_map['bulk_post']['0'][0]}, 400
+
+    # Apply the postings.
+    try:
+        results = bulk_post(current_user.username, postings)
+
+    except StaleDataError:
+        return {'error': flash_code_map['bulk_post']['1'][0]}, 409
+
+    # Return the flash code and matching message for each posting.
+    return {'results': [{'flash_code': flash_code, 
+                         'message': flash_code_map[caller][flash_code][0]} 
+                        for caller, flash_code in results]}
@@ -1,33 +1,58 @@
-from website.models import Account, Transactions, Curr_Term, Term_Data, db
+from website.models import Account, Account_Shard, Transactions, Term_Data, \
+    Balance_Data, Monthly_Totals, db
+from sqlalchemy import select, update, insert, delete, bindparam, func, \
+    tuple_, table, column, literal_column
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
 import website.utils.format as format
-from datetime import datetime
+from website.utils.format import to_cents
+from website.utils.term_cache import current_term
+from datetime import datetime, date, timedelta, time as dt_time
+import base64
+import csv
+import hashlib
+import heapq
+import io
+import json
+import random
+import time
 from wtforms.validators import ValidationError
-from flask import current_app, redirect, url_for
+from flask import redirect, url_for, request, make_response, current_app
 from website.utils.flash_codes import flash_codes
 from functools import wraps
 from flask_login import current_user
 
-def create_acc(username, bal=0.0, min_bal=0.0, acc_type=0, apy=0.0):
+# How many times to try a write that lost a race with another writer.
+CONFLICT_ATTEMPTS = 3
+
+# How many rows to fetch from the database at a time when streaming history.
+HISTORY_BATCH = 1000
+
+def create_acc(username, bal=0, min_bal=0, acc_type=0, apy=0.0):
     """Create an account.
 
     Args:
         username (str): The username to associate with the account.
-        bal (float, optional): The balance to be initialized with. 
-        Defaults to 0.0.
-        min_bal (float, optional): The minimum balance to be initialized with. 
-        Defaults to 0.0.
+        bal (int, optional): The balance to be initialized with in cents. 
+        Defaults to 0.
+        min_bal (int, optional): The minimum balance to be initialized with 
+        in cents. Defaults to 0.
         acc_type (int, optional): The type of account to make this. 
         Defaults to 0.
         apy (float, optional): The apy to be initialized for this account. 
         Defaults to 0.0.
     """    
 
-    new_acc = Account(acc_type=acc_type, username=username, apy=apy, min_bal=min_bal, bal=bal)
+    new_acc = Account(acc_type=acc_type, username=username, apy=apy, min_bal=min_bal, base_bal=bal)
     db.session.add(new_acc)
-    db.session.commit()
+
+    # Write the account first so we hold the write lock when we look up 
+    # the term, see current_term.
+    db.session.flush()
 
     acc_no = new_acc.acc_no
-    term = Term_Data(acc_no=acc_no, term=Curr_Term.query.all()[0].term, start_bal=bal)
+    term = Term_Data(acc_no=acc_no, term=current_term(), start_bal=bal)
 
     db.session.add(term)
     
@@ -62,171 +87,748 @@ def checkings_savings_retrieval(username):
 
     return savings_accounts, checkings_accounts
 
-def make_withdrawal(acc_no, amt, description):
+def apply_posting(acc_no, delta, min_bal_check=True):
+    """Change the balance on an account by delta in a single guarded UPDATE. 
+    The minimum balance check is part of the WHERE clause so that two workers 
+    posting to the same account at once can never both pass the check 
+    against a stale balance. Credits to a hot account go to one of its 
+    shards instead, see credit_shard.
+
+    Args:
+        acc_no (int): The account number to post to.
+        delta (int): The amount to add to the balance in cents (negative 
+        for withdrawals).
+        min_bal_check (bool, optional): Only match the row if the new balance 
+        stays at or above the minimum balance. Defaults to True.
+
+    Returns:
+        int: The balance after the posting, None if no row matched.
+    """    
+
+    stmt = update(Account).where(Account.acc_no == acc_no).values(
+        {Account.base_bal: Account.base_bal + delta, 
+         Account.version: Account.version + 1})
+
+    # The check is against the whole balance, shards included.
+    if min_bal_check:
+        stmt = stmt.where(Account.bal + delta >= Account.min_bal)
+
+    # Leave credits to hot accounts to credit_shard.
+    if delta > 0:
+        stmt = stmt.where(Account.shards == 0)
+
+    # Get the new balance back from the same statement where the database 
+    # supports it, otherwise read it back while we still hold the row. Hot 
+    # accounts also need their shards added on.
+    if db.engine.dialect.update_returning:
+        row = db.session.execute(
+            stmt.returning(Account.base_bal, Account.shards)).first()
+
+    elif db.session.execute(stmt).rowcount:
+        row = (None, 1)
+
+    else:
+        row = None
+
+    if row is None:
+        return credit_shard(acc_no, delta) if delta > 0 else None
+
+    end_bal, shards = row
+    if shards:
+        end_bal = db.session.execute(
+            select(Account.bal).where(Account.acc_no == acc_no)).scalar()
+
+    return end_bal
+
+def credit_shard(acc_no, delta):
+    """Credit a hot account through one of its shards, picked at random so 
+    that credits arriving together mostly update different rows. Debits 
+    still go through the account row, checked against the whole balance.
+
+    Args:
+        acc_no (int): The account number to credit.
+        delta (int): The amount to add to the balance in cents.
+
+    Returns:
+        int: The whole balance after the credit, None if the account 
+        doesn't exist.
+    """    
+
+    shards = db.session.execute(
+        select(Account.shards).where(Account.acc_no == acc_no)).scalar()
+
+    if not shards:
+        return None
+
+    stmt = update(Account_Shard).where(
+        Account_Shard.acc_no == acc_no, 
+        Account_Shard.shard == random.randrange(shards)).values(
+            bal=Account_Shard.bal + delta)
+
+    # The shards were changed underneath us (see set_shards), credit the 
+    # account row instead.
+    if db.session.execute(stmt).rowcount == 0:
+        db.session.execute(update(Account).where(
+            Account.acc_no == acc_no).values(
+                {Account.base_bal: Account.base_bal + delta, 
+                 Account.version: Account.version + 1}))
+
+    return db.session.execute(
+        select(Account.bal).where(Account.acc_no == acc_no)).scalar()
+
+def set_shards(acc_no, shards):
+    """Turn hot account mode on or off for an account, or change how many 
+    shards it has. Whatever the old shards hold is folded back into the 
+    base balance first, so the whole balance doesn't change. Turning it off 
+    rebuilds the account's daily balance rollup.
+
+    Only turn it on for databases that lock rows, like PostgreSQL. SQLite 
+    locks the whole database for every write, so shards can't let credits 
+    run side by side there and the extra statements make them slower (see 
+    tests/benchmarks/test_bench_hot_account.py).
+
+    Args:
+        acc_no (int): The account number to change.
+        shards (int): How many shards to spread credits over, 0 to turn hot 
+        account mode off.
+
+    Returns:
+        bool: False if the account doesn't exist.
+    """    
+
+    lock_accounts(acc_no)
+
+    held = db.session.execute(
+        select(func.coalesce(func.sum(Account_Shard.bal), 0))
+        .where(Account_Shard.acc_no == acc_no)).scalar()
+
+    db.session.execute(
+        delete(Account_Shard).where(Account_Shard.acc_no == acc_no))
+
+    matched = db.session.execute(
+        update(Account).where(Account.acc_no == acc_no).values(
+            {Account.base_bal: Account.base_bal + held, 
+             Account.shards: shards, 
+             Account.version: Account.version + 1})).rowcount
+
+    if not matched:
+        db.session.rollback()
+        return False
+
+    if shards:
+        db.session.execute(insert(Account_Shard), 
+                           [{'acc_no': acc_no, 'shard': shard, 'bal': 0} 
+                            for shard in range(shards)])
+
+    # Postings didn't keep the daily rollup while the account was hot (see 
+    # record_bal_data), so rebuild its rows before they are used again.
+    else:
+        db.session.execute(
+            delete(Balance_Data).where(Balance_Data.acc_no == acc_no))
+        db.session.execute(bal_data_backfill(acc_no))
+
+    db.session.commit()
+
+    return True
+
+def make_withdrawal(acc_no, amt, description, commit=True):
     """Make a withdrawal from an account for a given amount.
 
     Args:
         acc_no (int): The account number to deposit to.
-        amt (DecimalField): The amount to deposit.
+        amt (int): The amount to withdraw in cents.
         description (str): The descriptor for the deposit.
+        commit (bool, optional): Commit (or roll back) when done, pass False 
+        to leave that to the caller. Defaults to True.
 
     Returns:
         str: The char code for the return.
     """    
 
-    # Check account exists.
-    acc = Account.query.get(acc_no)
-    if not acc:
-        return '0'
+    amt = int(amt)
+
+    # Remove amount from balance, only if this would not leave the account 
+    # below minimum balance.
+    end_bal = apply_posting(acc_no, -amt)
+
+    # No row matched, find out whether the account is missing or the 
+    # balance is too low.
+    if end_bal is None:
+        if commit:
+            db.session.rollback()
 
-    # Convert decimal field to float.
-    amt = float(amt)
+        if not Account.query.get(acc_no):
+            return '0'
 
-    # Check withdrawal would not leave account below minimum balance.
-    if acc.bal - amt < acc.min_bal:
         return '1'
 
-    term = Curr_Term.query.all()[0].term
+    term = current_term()
 
     # Create a transaction object to store history.
-    transaction = Transactions(acc_no=acc_no, amt=amt, start_bal=acc.bal, 
-                               end_bal=acc.bal - amt, withdrawal_deposit=False,
+    transaction = Transactions(acc_no=acc_no, amt=amt, start_bal=end_bal + amt, 
+                               end_bal=end_bal, withdrawal_deposit=False,
                                description=description, term=term, 
                                date=datetime.now())
 
     db.session.add(transaction)
 
-    # Remove amount from balance.
-    acc.bal -= amt
+    record_bal_data({(acc_no, transaction.date.date()): end_bal})
 
-    db.session.commit()
+    if commit:
+        db.session.commit()
 
     # Return status code.
     return '2'
 
-def make_deposit(acc_no, amt, description):
+def make_deposit(acc_no, amt, description, commit=True):
     """Make a deposit into an account for a given amount.
 
     Args:
         acc_no (int): The account number to deposit to.
-        amt (DecimalField): The amount to deposit.
+        amt (int): The amount to deposit in cents.
         description (str): The descriptor for the deposit.
+        commit (bool, optional): Commit (or roll back) when done, pass False 
+        to leave that to the caller. Defaults to True.
 
     Returns:
         str: The char code for the return.
     """    
 
-    acc = Account.query.get(acc_no)
+    amt = int(amt)
+
+    # Add amount to account.
+    end_bal = apply_posting(acc_no, amt, min_bal_check=False)
 
     # Return a '0' status code if the account does not exist.
-    if not acc:
-        return '0'
+    if end_bal is None:
+        if commit:
+            db.session.rollback()
 
-    # Convert to float.
-    amt = float(amt)
+        return '0'
 
-    term = Curr_Term.query.all()[0].term
+    term = current_term()
 
     # Create a transaction object to record this transaction.
-    transaction = Transactions(acc_no=acc_no, amt=amt, start_bal=acc.bal, 
-                               end_bal=acc.bal + amt, withdrawal_deposit=True, 
+    transaction = Transactions(acc_no=acc_no, amt=amt, start_bal=end_bal - amt, 
+                               end_bal=end_bal, withdrawal_deposit=True, 
                                description=description, term=term, 
                                date=datetime.now())
     
     db.session.add(transaction)
 
-    # Add amount to account.
-    acc.bal += amt
+    record_bal_data({(acc_no, transaction.date.date()): end_bal})
 
-    db.session.commit()
+    if commit:
+        db.session.commit()
 
     # Return success code.
     return '1'
 
-def transfer(acc_no, transfer_no, description, amt=0.0, deletion=False, 
-             app=current_app):
-    """Because there are so many different status indicators for this function 
-    that result in different flash messages this is one of few functions where 
-    we call the flash code from the util function rather than the route for 
-    the page.
+def dialect_insert(model):
+    """Start an INSERT for the database in use, for the upserts that need 
+    ON CONFLICT.
 
     Args:
-        acc_no (_type_): _description_
-        transfer_no (_type_): _description_
-        description (_type_): _description_
-        amt (float, optional): _description_. Defaults to 0.0.
-        deletion (bool, optional): _description_. Defaults to False.
-        app (_type_, optional): _description_. Defaults to current_app.
+        model (db.Model/Table): The model or table to insert into.
 
     Returns:
-        _type_: _description_
+        Insert: The insert statement.
     """    
 
-    # Find the account associated with the account sending money. 
-    # Return false if not found.
-    acc = Account.query.get(acc_no)
+    return {'sqlite': sqlite.insert, 
+            'postgresql': postgresql.insert}[db.engine.dialect.name](model)
+
+def month_of(dt):
+    """The month of a date as YYYY-MM, computed by the database in use.
+
+    Args:
+        dt (ColumnElement): The date to take the month of.
+
+    Returns:
+        ColumnElement: The month expression.
+    """    
+
+    if db.engine.dialect.name == 'postgresql':
+        return func.to_char(dt, 'YYYY-MM')
+
+    return func.strftime('%Y-%m', dt)
+
+def record_bal_data(balances):
+    """Keep the daily balance rollup (Balance_Data) up to date from the 
+    posting path. Each account's row for the day is written, or overwritten, 
+    with the balance after its latest posting in one statement. Hot accounts 
+    are skipped, every credit writing the same row would undo the shards, 
+    their days are read from Transactions instead (see daily_balances).
+
+    Args:
+        balances (dict): Maps (account number, date) to the balance after 
+        the posting in cents.
+    """    
+
+    if not balances:
+        return
+
+    # Insert the row for the day, or overwrite its balance if it exists. 
+    # The select only matches accounts without shards.
+    stmt = dialect_insert(Balance_Data.__table__).from_select(
+        ['acc_no', 'date', 'bal'], 
+        select(Account.acc_no, bindparam('b_date', type_=db.Date), 
+               bindparam('b_bal', type_=db.Integer))
+        .where(Account.acc_no == bindparam('b_acc_no'), Account.shards == 0))
+    stmt = stmt.on_conflict_do_update(index_elements=['acc_no', 'date'], 
+                                      set_={'bal': stmt.excluded.bal})
+
+    db.session.execute(stmt, [{'b_acc_no': acc_no, 'b_date': day, 
+                               'b_bal': bal} 
+                              for (acc_no, day), bal in balances.items()])
+
+def last_bal_each_day(*where):
+    """Build the query for the end balance of the last transaction on each 
+    account each day, from Transactions.
+
+    Args:
+        *where (ColumnElement): Conditions on the Transactions rows to read.
+
+    Returns:
+        Select: The query, with acc_no, day and end_bal columns.
+    """    
+
+    day = func.date(Transactions.date, type_=db.Date)
+
+    # Number each day's transactions latest first.
+    ranked = select(
+        Transactions.acc_no, day.label('day'), Transactions.end_bal, 
+        func.row_number().over(
+            partition_by=(Transactions.acc_no, day), 
+            order_by=(Transactions.date.desc(), 
+                      Transactions.transaction_no.desc())).label('rn')
+    ).where(*where).subquery()
+
+    return select(ranked.c.acc_no, ranked.c.day, ranked.c.end_bal) \
+        .where(ranked.c.rn == 1)
+
+def bal_data_backfill(acc_no=None):
+    """Build the statement that fills Balance_Data from existing 
+    Transactions, see last_bal_each_day. The rows being filled should be 
+    deleted first.
+
+    Args:
+        acc_no (int, optional): Only fill this account. Defaults to None, 
+        every account.
+
+    Returns:
+        Insert: The INSERT ... SELECT statement.
+    """    
+
+    where = () if acc_no is None else (Transactions.acc_no == acc_no,)
+
+    return insert(Balance_Data).from_select(
+        ['acc_no', 'date', 'bal'], last_bal_each_day(*where))
+
+def keeps_min_bal(bal, min_bal, delta):
+    """Check a posting would not leave an account below its minimum balance. 
+    This is the same rule apply_posting checks in SQL.
+
+    Args:
+        bal (int): The balance before the posting in cents.
+        min_bal (int): The minimum balance allowed on the account in cents.
+        delta (int): The amount added to the balance in cents (negative for 
+        withdrawals).
+
+    Returns:
+        bool: True if the posting is allowed.
+    """    
+
+    return bal + delta >= min_bal
+
+def transfer_check(acc, transfer_acc):
+    """Check that a transfer is allowed between two accounts.
+
+    Args:
+        acc (Account): The account sending money, None if it doesn't exist.
+        transfer_acc (Account): The account recieving money, None if it 
+        doesn't exist.
+
+    Returns:
+        str: The char code for the failure, None if the transfer is allowed.
+    """    
+
+    # Check the sending account exists.
     if not acc:
-        flash_codes(flash_code='0')
-        return False
-    
-    if deletion:
-        amt = acc.bal
+        return '0'
 
-    # Find the account associated with the account recieving money. 
-    transfer_acc = Account.query.get(transfer_no)
+    # Check the recieving account exists.
     if not transfer_acc:
-        flash_codes(flash_code='1')
-        return False
+        return '1'
     
     # Check that the account we want to transfer to is open.
     if not transfer_acc.status:
-        flash_codes(flash_code='2')
-        return False
+        return '2'
     
     # Check that the usernames on both accounts match.
     if acc.username != transfer_acc.username:
-        flash_codes(flash_code='3')
-        return False
+        return '3'
 
-    # Get the current term.
-    term = Curr_Term.query.all()[0].term
+    return None
+
+def lock_accounts(*acc_nos, attempts=5, backoff=0.05):
+    """Lock the accounts a posting will write to before reading them, always 
+    in ascending account number order so two transfers between the same 
+    accounts can't deadlock. On SQLite, which locks the whole database, this 
+    takes the write lock up front with BEGIN IMMEDIATE instead of upgrading 
+    a read lock partway through. Other databases lock the rows with 
+    SELECT ... FOR UPDATE inside a savepoint. Failed attempts are retried 
+    with a jittered backoff. Only the failed attempt is undone, postings 
+    made earlier in the same transaction are kept, e.g. the rest of a group 
+    in Writer_Server.apply_commands.
+
+    Args:
+        *acc_nos (int): The account numbers to lock.
+        attempts (int, optional): How many times to try. Defaults to 5.
+        backoff (float, optional): The longest wait in seconds after the 
+        first failed attempt, doubled after each one. Defaults to 0.05.
+    """    
+
+    sqlite = db.engine.dialect.name == 'sqlite'
+
+    for attempt in range(attempts):
+        try:
+            if sqlite:
+                conn = db.session.connection()
+
+                # Already holding the write lock, e.g. in the writer 
+                # process where postings share a transaction.
+                if not conn.connection.dbapi_connection.in_transaction:
+                    conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+            else:
+                # A lock timeout or deadlock rolls back to the savepoint, 
+                # not the whole transaction.
+                with db.session.begin_nested():
+                    db.session.execute(
+                        select(Account.acc_no)
+                        .where(Account.acc_no.in_(acc_nos))
+                        .order_by(Account.acc_no)
+                        .with_for_update())
+
+            return
+
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+
+            # BEGIN IMMEDIATE only runs before anything is written, so 
+            # there is nothing to lose rolling back.
+            if sqlite:
+                db.session.rollback()
+
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+
+def make_transfer(acc_no, transfer_no, description, amt=0, deletion=False):
+    """Transfer an amount from one account to another. Both accounts are 
+    locked first (see lock_accounts) and balances are changed with guarded 
+    updates (see apply_posting), the caller is responsible for committing.
+
+    Args:
+        acc_no (int): The account number to transfer from.
+        transfer_no (int): The account number to transfer to.
+        description (str): The descriptor for the transfer.
+        amt (int, optional): The amount to transfer in cents. Defaults to 0.
+        deletion (bool, optional): Transfer the whole balance regardless of 
+        minimum balance, used when closing an account. Defaults to False.
+
+    Returns:
+        str: The char code for the return.
+    """    
+
+    # Lock both accounts before we read them. A hot account is credited 
+    # through its shards, so transfers into one leave its row unlocked.
+    hot = db.session.execute(
+        select(Account.shards).where(Account.acc_no == transfer_no)).scalar()
+
+    if hot:
+        lock_accounts(acc_no)
+    else:
+        lock_accounts(acc_no, transfer_no)
 
-    # If we are deleting the account we skip this if, 
-    # otherwise we need to do this.
-    if not deletion:
+    # Find the accounts sending and recieving money and check the transfer 
+    # is allowed between them.
+    acc = Account.query.get(acc_no)
+    transfer_acc = Account.query.get(transfer_no)
+
+    flash_code = transfer_check(acc, transfer_acc)
+    if flash_code:
+        return flash_code
+    
+    if deletion:
+        amt = db.session.execute(
+            select(Account.bal).where(Account.acc_no == acc_no)).scalar()
+
+    # Transfer the amount out of the account. If we are deleting the account 
+    # we skip the minimum balance check, otherwise the update only matches 
+    # if we are not going to dip below the minimum balance allowed.
+    end_bal = apply_posting(acc_no, -amt, min_bal_check=not deletion)
+    if end_bal is None:
+        return '4'
 
-        # Check if we are going to dip below the minimum balance allowed.
-        if acc.bal - amt < acc.min_bal:
-            flash_codes(flash_code='4')
-            return False
+    # Transfer the amount into the transfer account.
+    transfer_end_bal = apply_posting(transfer_no, amt, min_bal_check=False)
+
+    # Get the current term.
+    term = current_term()
+
+    # Both sides of the transfer are stamped with the same time, in local 
+    # time like every other posting so history orders by date.
+    now = datetime.now()
 
     # Add transaction object for sending account.
     transaction_from = Transactions(acc_no=acc_no, amt=amt, 
-                                    start_bal=acc.bal, 
-                                    end_bal=acc.bal - amt, 
+                                    start_bal=end_bal + amt, 
+                                    end_bal=end_bal, 
                                     withdrawal_deposit=False, 
-                                    description=description, term=term)
+                                    description=description, term=term, 
+                                    date=now)
 
     db.session.add(transaction_from)
     
     # Add transaction object for recieving account.
     transaction_to = Transactions(acc_no=transfer_no, amt=amt, 
-                                    start_bal=acc.bal, 
-                                    end_bal=acc.bal + amt, 
+                                    start_bal=transfer_end_bal - amt, 
+                                    end_bal=transfer_end_bal, 
                                     withdrawal_deposit=True, 
-                                    description=description, term=term)
+                                    description=description, term=term, 
+                                    date=now)
 
     db.session.add(transaction_to)
 
-    # Transfer the amount out of the account.
-    acc.bal -= amt
-
-    # Transfer the amount into the transfer account.
-    transfer_acc.bal += amt
+    record_bal_data({(acc_no, now.date()): end_bal, 
+                     (transfer_no, now.date()): transfer_end_bal})
 
     # Success code.
-    flash_codes(flash_code='5')
-    return True
+    return '5'
+
+def retry_on_conflict(f):
+    """A decorator to retry a function that writes Account objects when 
+    another writer changed the account first. Every balance change bumps 
+    Account.version, so an update checked against the version it read 
+    matches no row and raises StaleDataError (the ORM does this itself, see 
+    bulk_post for an UPDATE doing it by hand) rather than overwriting the 
+    newer balance. The session is rolled back, so the retry reads fresh 
+    rows.
+
+    Args:
+        f (function): The function that this is decorating, it must start 
+        its own transaction and commit it.
+
+    Returns:
+        function: The wrapped function.
+    """    
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        for attempt in range(CONFLICT_ATTEMPTS):
+            try:
+                return f(*args, **kwargs)
+
+            except StaleDataError:
+                db.session.rollback()
+
+                if attempt == CONFLICT_ATTEMPTS - 1:
+                    raise
+
+    return wrapper
+
+@retry_on_conflict
+def close_acc(acc_no, transfer_no=None):
+    """Close an account, first transferring its whole balance to another 
+    account if one is given.
+
+    Args:
+        acc_no (int): The account number to close.
+        transfer_no (int, optional): The account number to move the balance 
+        to. Defaults to None.
+
+    Returns:
+        str: The char code from make_transfer, '5' if the account was closed.
+    """    
+
+    if transfer_no:
+        # Transfer all money to a different account.
+        flash_code = make_transfer(acc_no, transfer_no, 
+                                   description='Upon deletion of account ' + 
+                                   format.format_acc_no(acc_no) + 
+                                   ', funds transferred to this account.', 
+                                   deletion=True)
+
+        if flash_code != '5':
+            db.session.rollback()
+            return flash_code
+
+    acc = Account.query.get(acc_no)
+    acc.close()
+
+    db.session.commit()
+
+    return '5'
+
+
+@retry_on_conflict
+def bulk_post(username, postings):
+    """Apply a batch of postings across a user's accounts in one transaction. 
+    Postings are checked in order against running balances using the same 
+    rules as make_withdrawal, make_deposit and make_transfer. All 
+    transaction rows are written with one bulk insert and each affected 
+    account balance is updated once, only if its version still matches the 
+    one the batch was checked against. Otherwise the batch is checked again 
+    from fresh balances, see retry_on_conflict.
+
+    Args:
+        username (str): The user making the postings, only their open 
+        accounts can be posted from (or to).
+        postings (list[dict]): The postings, each has an "op" ('withdraw', 
+        'deposit' or 'transfer'), "acc_no", "amt" (in dollars, more than 
+        0), "description" and for transfers a "transfer_no".
+
+    Raises:
+        StaleDataError: Balances kept changing underneath the batch, nothing 
+        was written.
+
+    Returns:
+        list[tuple]: The op and char code for each posting, in order.
+    """    
+
+    # Load the user's open accounts, and any other account transferred to, 
+    # once up front.
+    accounts = {acc.acc_no: acc for acc in 
+                Account.query.filter_by(username=username, status=True)}
+
+    transfer_nos = set()
+    for posting in postings:
+        # Malformed postings are reported by the loop below.
+        try:
+            if posting['op'] == 'transfer':
+                transfer_nos.add(int(posting['transfer_no']))
+
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            continue
+
+    others = {acc.acc_no: acc for acc in Account.query.filter(
+        Account.acc_no.in_(transfer_nos - set(accounts)))}
+
+    # Running balances, starting from the balance we loaded.
+    bals = {acc_no: acc.bal for acc_no, acc in accounts.items()}
+
+    now = datetime.now()
+
+    rows = []
+    results = []
+
+    for posting in postings:
+        try:
+            op = posting['op']
+            acc_no = int(posting['acc_no'])
+            amt = to_cents(posting['amt'])
+            description = str(posting.get('description', ''))
+
+            # Only positive amounts move money the way the op says, a
+            # negative deposit would be an unchecked withdrawal.
+            if amt <= 0:
+                raise ValueError(amt)
+
+            if op == 'transfer':
+                transfer_no = int(posting['transfer_no'])
+            elif op not in ('withdraw', 'deposit'):
+                raise ValueError(op)
+
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            results.append(('bulk_post', '0'))
+            continue
+
+        acc = accounts.get(acc_no)
+
+        if op == 'deposit':
+            if not acc:
+                results.append((op, '0'))
+                continue
+
+            deltas = [(acc_no, amt)]
+            flash_code = '1'
+
+        elif op == 'withdraw':
+            if not acc:
+                results.append((op, '0'))
+                continue
+
+            if not keeps_min_bal(bals[acc_no], acc.min_bal, -amt):
+                results.append((op, '1'))
+                continue
+
+            deltas = [(acc_no, -amt)]
+            flash_code = '2'
+
+        else:
+            flash_code = transfer_check(
+                acc, accounts.get(transfer_no, others.get(transfer_no)))
+
+            if not flash_code and not keeps_min_bal(bals[acc_no], 
+                                                    acc.min_bal, -amt):
+                flash_code = '4'
+
+            if flash_code:
+                results.append((op, flash_code))
+                continue
+
+            deltas = [(acc_no, -amt), (transfer_no, amt)]
+            flash_code = '5'
+
+        # Record a transaction for each account the posting touches.
+        for posted_no, delta in deltas:
+            rows.append({'acc_no': posted_no, 'amt': abs(delta), 
+                         'start_bal': bals[posted_no], 
+                         'end_bal': bals[posted_no] + delta, 
+                         'withdrawal_deposit': delta >= 0, 
+                         'description': description, 'date': now})
+
+            bals[posted_no] += delta
+
+        results.append((op, flash_code))
+
+    if rows:
+        # Apply each account's net change once, only if no other posting 
+        # changed the account since we loaded it. Credits to the shards of 
+        # a hot account don't bump its version, but they can only raise 
+        # the balance we checked against.
+        changed = [{'b_acc_no': acc_no, 
+                    'b_version': accounts[acc_no].version, 
+                    'b_delta': bal - accounts[acc_no].bal} 
+                   for acc_no, bal in bals.items() 
+                   if bal != accounts[acc_no].bal]
+
+        stmt = update(Account.__table__).where(
+            Account.acc_no == bindparam('b_acc_no'), 
+            Account.version == bindparam('b_version')).values(
+                bal=Account.base_bal + bindparam('b_delta'), 
+                version=Account.version + 1)
+
+        if changed and \
+                db.session.execute(stmt, changed).rowcount != len(changed):
+            raise StaleDataError('Balances changed during the bulk posting.')
+
+        # Now that we hold the write lock record the term on every row, 
+        # see current_term.
+        term = current_term()
+        for row in rows:
+            row['term'] = term
+
+        db.session.execute(insert(Transactions), rows)
+
+        record_bal_data({(acc_no, now.date()): bal 
+                         for acc_no, bal in bals.items() 
+                         if bal != accounts[acc_no].bal})
+
+    db.session.commit()
+
+    return results
 
 
 def account_check(f):
@@ -273,6 +875,85 @@ def account_check(f):
     return wrapper
 
 
+def writes_allowed(f):
+    """A decorator to protect routes that write to the database when the 
+    storage profile is read-only (see read_only), they would fail partway 
+    through with a database error. Instead a message is flashed and you are 
+    redirected.
+
+    Args:
+        f (function): The function that this is decorating.
+
+    Returns:
+        function/response: Returns the function if the database can be 
+        written to, otherwise the function redirects you.
+    """    
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if current_app.config['READ_ONLY']:
+            flash_codes(flash_code='0', caller='read_only')
+            return redirect(url_for('main.view_accounts'))
+
+        return f(*args, **kwargs)
+
+    return wrapper
+
+
+def account_etag(f):
+    """A decorator for json routes serving data on one account, to answer 
+    conditional requests. The ETag is made from the account's latest 
+    transaction number and balance, so it changes with every posting, 
+    today's date and the query string. A request whose If-None-Match still 
+    matches gets an empty 304 from that one indexed lookup, without running 
+    the route.
+
+    Args:
+        f (function): The function that this is decorating.
+
+    Returns:
+        function/response: The wrapped function, its response carries the 
+        ETag.
+    """    
+
+    @wraps(f)
+    def wrapper(acc_no, *args, **kwargs):
+        # The latest transaction on the account, found through the 
+        # (acc_no, date, transaction_no) index.
+        last_no = select(Transactions.transaction_no) \
+            .where(Transactions.acc_no == acc_no) \
+            .order_by(Transactions.date.desc(), 
+                      Transactions.transaction_no.desc()) \
+            .limit(1).scalar_subquery()
+
+        last_no, bal = db.session.execute(
+            select(last_no, Account.bal).where(Account.acc_no == acc_no)
+        ).first()
+
+        # Dated as well, the graph ends on today's balance. The query 
+        # string is hashed in too, responses differ by format, resolution 
+        # and range.
+        query = hashlib.sha1(request.query_string).hexdigest()[:12]
+        etag = f'{acc_no}-{last_no or 0}-{bal}-{datetime.now().date()}-' \
+            f'{query}'
+
+        # If-None-Match compares weakly, a proxy that compresses the 
+        # response (nginx gzip) hands the tag back as W/"...".
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(f(acc_no, *args, **kwargs))
+
+        # Always check back with us before using a cached copy.
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+
+        return response
+
+    return wrapper
+
+
 def account_exist(form, field):
     """A wtforms validator to check that the account exists.
 
@@ -293,59 +974,533 @@ def account_exist(form, field):
         raise ValidationError('That account does not exist.')
     
 
-def account_history(acc_no):
-    """Gather date data for transactions (x values), and balance data for 
-    transactions (y values).
+def daily_balances(acc_no, since=None):
+    """Gather the balance at the end of each day with postings on an 
+    account, oldest first, from the daily rollup (see record_bal_data), 
+    ending with the current balance for today. At most one row is read per 
+    day, however many transactions the account has. Hot accounts have no 
+    rollup, their days are found from Transactions.
 
     Args:
         acc_no (int): The account number to get data for.
+        since (date, optional): Only include days after this one. Defaults 
+        to None, the whole history.
+
+    Yields:
+        tuple: The date (x value) and balance in cents (y value) for each 
+        point.
+    """    
+
+    today = datetime.now().date()
+
+    shards = db.session.execute(
+        select(Account.shards).where(Account.acc_no == acc_no)).scalar()
+
+    if shards:
+        where = [Transactions.acc_no == acc_no, 
+                 Transactions.date < datetime.combine(today, dt_time.min)]
+
+        if since:
+            where.append(Transactions.date >= 
+                         datetime.combine(since + timedelta(days=1), 
+                                          dt_time.min))
+
+        days = last_bal_each_day(*where).subquery()
+        stmt = select(days.c.day, days.c.end_bal).order_by(days.c.day)
+
+    else:
+        stmt = select(Balance_Data.date, Balance_Data.bal) \
+            .where(Balance_Data.acc_no == acc_no, Balance_Data.date < today) \
+            .order_by(Balance_Data.date)
+
+        if since:
+            stmt = stmt.where(Balance_Data.date > since)
+
+    yield from db.session.execute(
+        stmt, execution_options={'yield_per': HISTORY_BATCH})
+
+    # End on today's balance.
+    curr_bal = db.session.execute(
+        select(Account.bal).where(Account.acc_no == acc_no)).scalar()
+
+    yield today, curr_bal
+
+def balance_timeline(username):
+    """Gather the combined balance of a user's open accounts after every 
+    posting, oldest first. Each account's transactions are read through 
+    their own ordered, batched query and the queries are merged as they are 
+    read, so only a batch per account is held in memory. Every account 
+    counts from the start, with the balance it had before its first 
+    transaction (its current balance if it has none), the same as 
+    balance_as_of.
+
+    Args:
+        username (str): The user to get the timeline for.
+
+    Yields:
+        tuple: The date, then the total, savings and checkings balances in 
+        cents after the postings at that time.
+    """    
+
+    accounts = db.session.execute(
+        select(Account.acc_no, Account.acc_type, Account.bal)
+        .where(Account.username == username, Account.status == True)).all()
+
+    acc_types = {acc.acc_no: acc.acc_type for acc in accounts}
+
+    def rows(acc_no):
+        yield from db.session.execute(
+            select(Transactions.date, Transactions.transaction_no, 
+                   Transactions.acc_no, Transactions.end_bal)
+            .where(Transactions.acc_no == acc_no)
+            .order_by(Transactions.date, Transactions.transaction_no), 
+            execution_options={'yield_per': HISTORY_BATCH})
+
+    merged = heapq.merge(*[rows(acc.acc_no) for acc in accounts], 
+                         key=lambda row: (row.date, row.transaction_no))
+
+    # The balance each account has contributed so far, starting from what 
+    # it held before its first transaction, and the totals by account type.
+    bals = {}
+    totals = [0, 0]
+    for acc in accounts:
+        first = db.session.execute(
+            select(Transactions.start_bal)
+            .where(Transactions.acc_no == acc.acc_no)
+            .order_by(Transactions.date, Transactions.transaction_no)
+            .limit(1)).scalar()
+
+        bals[acc.acc_no] = acc.bal if first is None else first
+        totals[acc.acc_type] += bals[acc.acc_no]
+
+    prev = None
+    for row in merged:
+        # Postings made together, like both sides of a transfer, are 
+        # reported once.
+        if prev and row.date != prev:
+            yield prev, sum(totals), totals[0], totals[1]
+
+        acc_type = acc_types[row.acc_no]
+        totals[acc_type] += row.end_bal - bals[row.acc_no]
+        bals[row.acc_no] = row.end_bal
+
+        prev = row.date
+
+    if prev:
+        yield prev, sum(totals), totals[0], totals[1]
+
+    # End on the current balances.
+    totals = [0, 0]
+    for acc in accounts:
+        totals[acc.acc_type] += acc.bal
+
+    yield datetime.now(), sum(totals), totals[0], totals[1]
+
+def monthly_totals(acc_no):
+    """Get the total deposited and withdrawn on an account each month, 
+    summed by the database with GROUP BY. Closed months never change, so 
+    they are cached in Monthly_Totals the first time they are summed (unless 
+    the database is read-only) and afterwards only the months since the 
+    last cached one are summed, through the (acc_no, date, transaction_no) 
+    index.
+
+    Args:
+        acc_no (int): The account number to get totals for.
 
     Returns:
-        tuple: A tuple of lists, the 0th index is labels and the 1st 
-        index is values.
+        list[tuple]: The month (YYYY-MM), deposits and withdrawals in cents 
+        for each month with transactions, oldest first.
     """    
 
-    # Get current balance.
-    curr_bal = Account.query.get(acc_no).bal
+    curr_month = datetime.now().strftime('%Y-%m')
 
-    # Get all transactions for this account.
-    transactions = Transactions.query.filter_by(acc_no=acc_no).all()
-    
-    sz = len(transactions)
+    cached = db.session.execute(
+        select(Monthly_Totals.month, Monthly_Totals.deposits, 
+               Monthly_Totals.withdrawals)
+        .where(Monthly_Totals.acc_no == acc_no, 
+               Monthly_Totals.month < curr_month)
+        .order_by(Monthly_Totals.month)).all()
 
-    # Get starting point for data.
-    labels = [format.format_date_2(datetime.now())]
-    values = [curr_bal]
+    totals = {month: [deposits, withdrawals] 
+              for month, deposits, withdrawals in cached}
 
+    month = month_of(Transactions.date)
 
-    # Iterate through transactions in reverse, doing this we can 
-    # reconstruct prior balances so we can get data points.
-    i = sz - 1
-    while i >= 0:
-        t = transactions[i]
+    stmt = select(month, Transactions.withdrawal_deposit, 
+                  func.sum(Transactions.amt)) \
+        .where(Transactions.acc_no == acc_no) \
+        .group_by(month, Transactions.withdrawal_deposit)
 
-        # If it is a withdrawal add to the current balance (going in reverse).
-        if t.withdrawal_deposit == False:
-            curr_bal += t.amt
-        else:
-            curr_bal -= t.amt
+    # Only sum the months after the last cached one.
+    if cached:
+        year, last = map(int, cached[-1].month.split('-'))
+        after = datetime(year + last // 12, last % 12 + 1, 1)
+
+        stmt = stmt.where(Transactions.date >= after)
+
+    fresh = {}
+    for row_month, deposit, amt in db.session.execute(stmt):
+        fresh.setdefault(row_month, [0, 0])[0 if deposit else 1] += amt
+
+    # Cache the months that have closed since, keeping the copy another 
+    # request may have cached first. Nothing is cached through a read-only 
+    # database, the months are just summed again next time.
+    closed = [{'acc_no': acc_no, 'month': row_month, 'deposits': deposits, 
+               'withdrawals': withdrawals} 
+              for row_month, (deposits, withdrawals) in fresh.items() 
+              if row_month < curr_month]
+
+    if closed and not current_app.config['READ_ONLY']:
+        db.session.execute(
+            dialect_insert(Monthly_Totals).on_conflict_do_nothing(), closed)
+        db.session.commit()
+
+    totals.update(fresh)
+
+    return [(row_month, deposits, withdrawals) 
+            for row_month, (deposits, withdrawals) in sorted(totals.items())]
+
+# The full-text index over descriptions, see TRANSACTIONS_FTS in models.
+transactions_fts = table('transactions_fts', column('rowid'))
+
+def search_transactions(username, text, size, page=0):
+    """Search the descriptions of a user's transactions through the 
+    full-text index, best matches first (ranked by bm25). Every word in the 
+    search has to appear in the description.
+
+    Args:
+        username (str): The user whose accounts to search.
+        text (str): What to search for.
+        size (int): The most matches to return.
+        page (int, optional): Which page of matches to return. Defaults to 
+        0, the first page.
+
+    Returns:
+        tuple: A list of matching Transactions rows and whether there is 
+        another page.
+    """    
+
+    # Quote each word so nothing typed is read as FTS5 query syntax.
+    query = ' '.join('"' + word.replace('"', '""') + '"' 
+                     for word in text.split())
+
+    fts = literal_column('transactions_fts')
+
+    stmt = select(Transactions.transaction_no, Transactions.acc_no, 
+                  Transactions.date, Transactions.amt, 
+                  Transactions.withdrawal_deposit, Transactions.description) \
+        .join_from(transactions_fts, Transactions, 
+                   Transactions.transaction_no == transactions_fts.c.rowid) \
+        .join(Account, Account.acc_no == Transactions.acc_no) \
+        .where(fts.op('MATCH')(query), Account.username == username) \
+        .order_by(func.bm25(fts), Transactions.transaction_no.desc()) \
+        .limit(size + 1).offset(page * size)
+
+    rows = db.session.execute(stmt).all()
+
+    return rows[:size], len(rows) > size
+
+def balance_as_of(acc_no, at):
+    """Get the balance an account had at a point in time. Every transaction 
+    stores the balance it left the account with, so each one is a 
+    checkpoint. The lookup is one seek down the (acc_no, date, 
+    transaction_no) index to the last transaction at or before the time, 
+    nothing is replayed.
+
+    Args:
+        acc_no (int): The account number to get the balance for.
+        at (datetime): The point in time.
+
+    Returns:
+        int: The balance in cents, None if the account doesn't exist.
+    """    
+
+    bal = db.session.execute(
+        select(Transactions.end_bal)
+        .where(Transactions.acc_no == acc_no, Transactions.date <= at)
+        .order_by(Transactions.date.desc(), 
+                  Transactions.transaction_no.desc())
+        .limit(1)).scalar()
+
+    if bal is not None:
+        return bal
+
+    # Before its first transaction the account held what it opened with.
+    bal = db.session.execute(
+        select(Transactions.start_bal)
+        .where(Transactions.acc_no == acc_no)
+        .order_by(Transactions.date, Transactions.transaction_no)
+        .limit(1)).scalar()
+
+    if bal is not None:
+        return bal
+
+    # No transactions at all, it has always held its current balance.
+    return db.session.execute(
+        select(Account.bal).where(Account.acc_no == acc_no)).scalar()
+
+def export_rows(acc_no, start=None, end=None):
+    """Stream an account's transactions, oldest first. Rows are read from 
+    the (acc_no, date, transaction_no) index in batches of HISTORY_BATCH, so 
+    memory stays the same however many transactions the range holds.
+
+    Args:
+        acc_no (int): The account number to export.
+        start (datetime, optional): Only include transactions on or after 
+        this day (midnight). Defaults to None.
+        end (datetime, optional): Only include transactions on or before 
+        this day (midnight). Defaults to None.
+
+    Yields:
+        row: Each Transactions row in the range.
+    """    
+
+    stmt = select(Transactions.transaction_no, Transactions.date, 
+                  Transactions.amt, Transactions.start_bal, 
+                  Transactions.end_bal, Transactions.withdrawal_deposit, 
+                  Transactions.description) \
+        .where(Transactions.acc_no == acc_no) \
+        .order_by(Transactions.date, Transactions.transaction_no)
+
+    if start:
+        stmt = stmt.where(Transactions.date >= start)
+
+    if end:
+        stmt = stmt.where(Transactions.date < end + timedelta(days=1))
+
+    yield from db.session.execute(
+        stmt, execution_options={'yield_per': HISTORY_BATCH})
+
+def export_csv(rows):
+    """Write exported transactions as CSV, see export_rows. Amounts are in 
+    dollars with two decimal places (see to_dollar_str), withdrawals are 
+    negative.
+
+    Args:
+        rows (iterable): The Transactions rows to write.
+
+    Yields:
+        str: The header line, then the rows a batch at a time.
+    """    
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    writer.writerow(['transaction_no', 'date', 'amount', 'start_bal', 
+                     'end_bal', 'description'])
+
+    for i, row in enumerate(rows, 1):
+        amt = row.amt if row.withdrawal_deposit else -row.amt
+
+        writer.writerow([row.transaction_no, row.date.isoformat(), 
+                         format.to_dollar_str(amt), 
+                         format.to_dollar_str(row.start_bal), 
+                         format.to_dollar_str(row.end_bal), row.description])
+
+        # Hand over what's written every batch and start again.
+        if not i % HISTORY_BATCH:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+
+    yield buf.getvalue()
+
+def ofx_date(dt):
+    """Format a datetime the way OFX expects, YYYYMMDDHHMMSS.
+
+    Args:
+        dt (datetime): The datetime to format.
+
+    Returns:
+        str: The formatted datetime.
+    """    
+    return dt.strftime('%Y%m%d%H%M%S')
+
+def ofx_text(text):
+    """Escape text for an OFX element.
+
+    Args:
+        text (str): The text to escape.
+
+    Returns:
+        str: The escaped text.
+    """    
+    return text.replace('&', '&amp;').replace('<', '&lt;') \
+        .replace('>', '&gt;')
+
+def export_ofx(acc, rows, start, end):
+    """Write exported transactions as an OFX 2 bank statement, see 
+    export_rows. The ledger balance is the balance after the last 
+    transaction written, it is tracked as rows go by so nothing is held.
+
+    Args:
+        acc (Account): The account being exported.
+        rows (iterable): The Transactions rows to write.
+        start (datetime): The start of the range, None from the first 
+        transaction.
+        end (datetime): The end of the range, None for now.
+
+    Yields:
+        str: The statement a piece at a time.
+    """    
+
+    now = datetime.now()
+    end = end + timedelta(days=1) if end else now
+
+    # Without a start the range begins at the first transaction.
+    if not start:
+        start = db.session.execute(
+            select(func.min(Transactions.date))
+            .where(Transactions.acc_no == acc.acc_no)).scalar() or now
+
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<?OFX OFXHEADER="200" VERSION="220" SECURITY="NONE" '
+           'OLDFILEUID="NONE" NEWFILEUID="NONE"?>\n'
+           '<OFX><BANKMSGSRSV1><STMTTRNRS><TRNUID>0</TRNUID>'
+           '<STATUS><CODE>0</CODE><SEVERITY>INFO</SEVERITY></STATUS>'
+           '<STMTRS><CURDEF>USD</CURDEF>'
+           '<BANKACCTFROM><BANKID>0</BANKID>'
+           f'<ACCTID>{acc.acc_no}</ACCTID>'
+           f'<ACCTTYPE>{"CHECKING" if acc.acc_type else "SAVINGS"}</ACCTTYPE>'
+           '</BANKACCTFROM>'
+           f'<BANKTRANLIST><DTSTART>{ofx_date(start)}'
+           f'</DTSTART><DTEND>{ofx_date(end)}</DTEND>\n')
+
+    bal = None
+    parts = []
+    for row in rows:
+        amt = row.amt if row.withdrawal_deposit else -row.amt
+
+        parts.append(
+            f'<STMTTRN><TRNTYPE>{"CREDIT" if amt >= 0 else "DEBIT"}'
+            f'</TRNTYPE><DTPOSTED>{ofx_date(row.date)}</DTPOSTED>'
+            f'<TRNAMT>{format.to_dollar_str(amt)}</TRNAMT>'
+            f'<FITID>{row.transaction_no}</FITID>'
+            f'<NAME>{ofx_text(row.description[:32])}</NAME>'
+            f'<MEMO>{ofx_text(row.description)}</MEMO></STMTTRN>\n')
+
+        bal = row.end_bal
+
+        # Hand over what's written every batch and start again.
+        if len(parts) == HISTORY_BATCH:
+            yield ''.join(parts)
+            parts = []
+
+    yield ''.join(parts)
+
+    # With nothing in the range the balance is whatever it was at the end. 
+    # The range stops just before end, a transaction at end isn't in it.
+    if bal is None:
+        bal = balance_as_of(acc.acc_no, end - timedelta(microseconds=1))
+
+    yield ('</BANKTRANLIST>'
+           f'<LEDGERBAL><BALAMT>{format.to_dollar_str(bal)}</BALAMT>'
+           f'<DTASOF>{ofx_date(min(end, now))}</DTASOF></LEDGERBAL>'
+           '</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n')
+
+def encode_cursor(dt, transaction_no):
+    """Make the opaque cursor handed to clients to continue paging after a 
+    transaction.
+
+    Args:
+        dt (datetime): The date of the last transaction on the page.
+        transaction_no (int): The number of the last transaction on the page.
+
+    Returns:
+        str: The cursor.
+    """    
+
+    raw = json.dumps([dt.isoformat(), transaction_no])
+
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """Read back a cursor made by encode_cursor.
+
+    Args:
+        cursor (str): The cursor.
+
+    Raises:
+        ValueError: The cursor is malformed.
+
+    Returns:
+        tuple: The date and transaction number the cursor points at.
+    """    
+
+    try:
+        dt, transaction_no = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(dt), int(transaction_no)
+
+    except (TypeError, ValueError, base64.binascii.Error) as e:
+        raise ValueError(cursor) from e
+
+def parse_as_of(at):
+    """Read the time for a "balance as of" request. A day on its own means 
+    the end of that day.
+
+    Args:
+        at (str): The time, YYYY-MM-DD or an ISO datetime.
+
+    Raises:
+        ValueError: The time is malformed.
+
+    Returns:
+        datetime: The point in time.
+    """    
+
+    if len(at) == 10:
+        return datetime.combine(date.fromisoformat(at), dt_time.max)
+
+    return datetime.fromisoformat(at)
+
+def transaction_page(acc_no, size, start=None, end=None, cursor=None):
+    """Get one page of an account's transactions, newest first. Pages are 
+    found by seeking the (acc_no, date, transaction_no) index to just past 
+    the cursor rather than with OFFSET, so a deep page costs the same as 
+    the first.
+
+    Args:
+        acc_no (int): The account number to get transactions for.
+        size (int): The most transactions to return.
+        start (datetime, optional): Only include transactions on or after 
+        this day (midnight). Defaults to None.
+        end (datetime, optional): Only include transactions on or before 
+        this day (midnight). Defaults to None.
+        cursor (str, optional): The cursor from the previous page. Defaults 
+        to None, the first page.
+
+    Raises:
+        ValueError: The cursor is malformed.
+
+    Returns:
+        tuple: A list of Transactions rows and the cursor for the next page, 
+        None on the last page.
+    """    
+
+    stmt = select(Transactions.transaction_no, Transactions.date, 
+                  Transactions.amt, Transactions.start_bal, 
+                  Transactions.end_bal, Transactions.withdrawal_deposit, 
+                  Transactions.description, Transactions.term) \
+        .where(Transactions.acc_no == acc_no) \
+        .order_by(Transactions.date.desc(), 
+                  Transactions.transaction_no.desc())
+
+    if start:
+        stmt = stmt.where(Transactions.date >= start)
 
-        # Add x and y to end of labels and values.
-        dt = format.format_date_2(t.date)
-        labels.append(dt)
-        values.append(curr_bal)
+    if end:
+        stmt = stmt.where(Transactions.date < end + timedelta(days=1))
 
-        i -= 1
+    if cursor:
+        key = tuple_(Transactions.date, Transactions.transaction_no)
+        stmt = stmt.where(key < tuple_(*decode_cursor(cursor)))
 
-    # The data is currently in reverse order so reverse both lists.
-    i = 0
-    j = len(labels) - 1
-    while i < j:
-        labels[i], labels[j] = labels[j], labels[i]
+    # Fetch one extra row to know if there is another page.
+    rows = db.session.execute(stmt.limit(size + 1)).all()
 
-        values[i], values[j] = values[j], values[i]
+    if len(rows) <= size:
+        return rows, None
 
-        i += 1
-        j -= 1
+    rows = rows[:size]
 
-    return labels, values
+    return rows, encode_cursor(rows[-1].date, rows[-1].transaction_no)
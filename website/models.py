@@ -1,6 +1,9 @@
 from flask_login import UserMixin
+from sqlalchemy import select, event, DDL
+from sqlalchemy.orm import column_property
 from sqlalchemy.sql import func
 from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
 from . import db, login_manager
 
 @login_manager.user_loader
@@ -21,7 +24,25 @@ class User(UserMixin, db.Model):
     # Store name
     name = db.Column(db.String(1000))
 
+class Account_Shard(db.Model):
+    # Each shard of a hot account is looked up by account and shard number.
+    __table_args__ = (db.Index('ix_account_shard_acc_no_shard', 
+                               'acc_no', 'shard', unique=True),)
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    acc_no = db.Column(db.Integer)
+
+    # Which of the account's shards this is, 0 to Account.shards - 1.
+    shard = db.Column(db.Integer)
+
+    # The part of the balance credited to this shard in cents.
+    bal = db.Column(db.Integer, nullable=False, default=0)
+
 class Account(db.Model):
+    # Accounts are looked up by owner.
+    __table_args__ = (db.Index('ix_account_username', 'username'),)
+
     # Primary key is account number
     acc_no = db.Column(db.Integer, unique=True, primary_key=True)
 
@@ -34,15 +55,35 @@ class Account(db.Model):
     # Store interest rate
     apy = db.Column(db.Float)
 
-    # Store balance
-    bal = db.Column(db.Float)
+    # Store balance, money is always stored in integer cents. On a hot 
+    # account this is only the part of the balance that isn't held in its 
+    # shards.
+    base_bal = db.Column('bal', db.Integer)
 
-    # Store minimum balance allowed
-    min_bal = db.Column(db.Float)
+    # Store minimum balance allowed (cents)
+    min_bal = db.Column(db.Integer)
 
     # False for a closed account, True for open accounts.
     status = db.Column(db.Boolean, default=True)
 
+    # Bumped on every change, writes through the ORM only match the row if 
+    # nobody else changed it since it was loaded.
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    # 0 for a normal account. Hot accounts spread credits over this many 
+    # Account_Shard rows so they don't all queue on this row.
+    shards = db.Column(db.Integer, nullable=False, default=0)
+
+    # The whole balance in cents, the base balance plus the shards. Read 
+    # only, postings go through apply_posting.
+    bal = column_property(
+        base_bal + select(func.coalesce(func.sum(Account_Shard.bal), 0))
+        .where(Account_Shard.acc_no == acc_no)
+        .correlate_except(Account_Shard)
+        .scalar_subquery())
+
+    __mapper_args__ = {'version_id_col': version}
+
     def open(self):
         self.status = True
     
@@ -59,13 +100,15 @@ class Bank_Settings(db.Model):
     # Store checkings interest rate
     checkings_apy = db.Column(db.Float)
 
-    # Store savings minimum balance
-    savings_min = db.Column(db.Float)
+    # Store savings minimum balance (cents)
+    savings_min = db.Column(db.Integer)
 
-    # Store checkings minimum balance
-    checkings_min = db.Column(db.Float)
+    # Store checkings minimum balance (cents)
+    checkings_min = db.Column(db.Integer)
 
 class Messages(db.Model):
+    __table_args__ = (db.Index('ix_messages_username', 'username'),)
+
     # Id for message
     id = db.Column(db.Integer, primary_key=True)
 
@@ -85,17 +128,29 @@ class Alerts(db.Model):
     content = db.Column(db.String(5000))
 
 class Transactions(db.Model):
+    # Transactions are looked up by account and term for statements, and 
+    # read in date order by account for history.
+    __table_args__ = (db.Index('ix_transactions_acc_no_term', 
+                               'acc_no', 'term'), 
+                      db.Index('ix_transactions_acc_no_date', 
+                               'acc_no', 'date', 'transaction_no'))
+
     transaction_no = db.Column(db.Integer, primary_key=True)
 
-    date = db.Column(db.DateTime, server_default=func.now())
+    # Set from python so every date is stored in the same format (with 
+    # microseconds) and sorts correctly as text, see transaction_dates in 
+    # upgrade_db.
+    date = db.Column(db.DateTime, default=datetime.now, 
+                     server_default=func.now())
 
     acc_no = db.Column(db.Integer)
 
-    amt = db.Column(db.Float)
+    # Amounts and balances in cents.
+    amt = db.Column(db.Integer)
 
-    start_bal = db.Column(db.Float)
+    start_bal = db.Column(db.Integer)
 
-    end_bal = db.Column(db.Float)
+    end_bal = db.Column(db.Integer)
 
     # False for withdrawal, true for deposit
     withdrawal_deposit = db.Column(db.Boolean)
@@ -104,7 +159,37 @@ class Transactions(db.Model):
 
     term = db.Column(db.Integer)
 
+# Full-text index over transaction descriptions (SQLite FTS5). It reads the 
+# text from the transactions table and triggers keep it in sync as 
+# transactions are written.
+TRANSACTIONS_FTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5("
+    "description, content='transactions', content_rowid='transaction_no')",
+
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON "
+    "transactions BEGIN INSERT INTO transactions_fts(rowid, description) "
+    "VALUES (new.transaction_no, new.description); END",
+
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON "
+    "transactions BEGIN INSERT INTO transactions_fts(transactions_fts, "
+    "rowid, description) VALUES ('delete', old.transaction_no, "
+    "old.description); END",
+
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF "
+    "description ON transactions BEGIN INSERT INTO transactions_fts("
+    "transactions_fts, rowid, description) VALUES ('delete', "
+    "old.transaction_no, old.description); INSERT INTO transactions_fts("
+    "rowid, description) VALUES (new.transaction_no, new.description); END",
+]
+
+for statement in TRANSACTIONS_FTS:
+    event.listen(Transactions.__table__, 'after_create', 
+                 DDL(statement).execute_if(dialect='sqlite'))
+
 class Statements(db.Model):
+    __table_args__ = (db.Index('ix_statements_username_date', 
+                               'username', 'date'),)
+
     id = db.Column(db.Integer, primary_key=True)
 
     username = db.Column(db.String(100))
@@ -117,25 +202,49 @@ class Statements(db.Model):
 
     term = db.Column(db.Integer)
 
-# Table no longer useful.
-#
-# class Balance_Data(db.Model):
-#     id = db.Column(db.Integer, primary_key=True)
-#
-#     acc_no = db.Column(db.Integer)
-#
-#     date = db.Column(db.Date)
-#
-#     bal = db.Column(db.Float)
+class Balance_Data(db.Model):
+    # One row per account per day, looked up by account in date order.
+    __table_args__ = (db.Index('ix_balance_data_acc_no_date', 
+                               'acc_no', 'date', unique=True),)
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    acc_no = db.Column(db.Integer)
+
+    date = db.Column(db.Date)
+
+    # Balance at the end of the day in cents.
+    bal = db.Column(db.Integer)
+
+class Monthly_Totals(db.Model):
+    # One row per account per closed month, looked up by account in month 
+    # order.
+    __table_args__ = (db.Index('ix_monthly_totals_acc_no_month', 
+                               'acc_no', 'month', unique=True),)
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    acc_no = db.Column(db.Integer)
+
+    # Month in the form YYYY-MM.
+    month = db.Column(db.String(7))
+
+    # Totals deposited and withdrawn over the month in cents.
+    deposits = db.Column(db.Integer)
+
+    withdrawals = db.Column(db.Integer)
 
 class Term_Data(db.Model):
+    __table_args__ = (db.Index('ix_term_data_acc_no_term', 'acc_no', 'term'),)
+
     id = db.Column(db.Integer, primary_key=True)
     
     acc_no = db.Column(db.Integer)
     
     term = db.Column(db.Integer)
 
-    start_bal = db.Column(db.Float)
+    # Balance at the start of the term in cents.
+    start_bal = db.Column(db.Integer)
 
 class Curr_Term(db.Model):
     term = db.Column(db.Integer, primary_key=True)
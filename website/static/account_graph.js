@@ -48,13 +48,45 @@ function format_date(date) {
     return res;
 }
 
+/**
+ * Decodes the compact graph data format into points. Day steps are added 
+ * on to the base day and balances are turned from cents into dollars.
+ * @param {JSON} data JSON data with base, days and cents.
+ * 
+ * @returns {Array} The [label, value] pairs, labels in MM-DD-YYYY form.
+ */
+function decode_compact(data) {
+    var points = [];
+
+    // Work in UTC so day steps never cross a daylight savings change.
+    var parts = data.base ? data.base.split('-') : [];
+    var day = Date.UTC(parts[0], parts[1] - 1, parts[2]);
+
+    for (var i = 0; i < data.days.length; i++) {
+        day += data.days[i] * 86400000;
+
+        var date = new Date(day);
+        var label = String(date.getUTCMonth() + 1).padStart(2, '0') + '-' + 
+            String(date.getUTCDate()).padStart(2, '0') + '-' + 
+            date.getUTCFullYear();
+
+        points.push([label, data.cents[i] / 100]);
+    }
+
+    return points;
+}
+
 /**
  * Creates a line chart of previous account history.
  * 
- * @param {JSON} data JSON data which has labels and values, used 
- * to define each point on our chart.
+ * @param {Array} points The [label, value] pairs used to define each 
+ * point on our chart.
  */
-function make_chart(data) {
+function make_chart(points) {
+    // Split the points into x and y values.
+    var labels = points.map((point) => point[0]);
+    var values = points.map((point) => point[1]);
+
     // Create the new chart element, target canvas with id 
     // account_history_chart.
     new Chart(document.getElementById("account_history_chart"), {
@@ -65,7 +97,7 @@ function make_chart(data) {
         data: {
 
             // X values
-            labels: data.labels,
+            labels: labels,
 
             // Defines points.
             datasets: [
@@ -74,7 +106,7 @@ function make_chart(data) {
                     label: "Balance",
 
                     // Y value corresponding to label at same index.
-                    data: data.values,
+                    data: values,
 
                     fill: false,
                     backgroundColor: "rgb(35, 209, 96)",
@@ -228,5 +260,74 @@ function make_chart(data) {
     });
 }
 
-// Fetch data from passed url, convert is json and then make the chart.
-fetch(url).then(data => data.json()).then((data) => make_chart(data))
+// Ask for no more points than the chart is pixels wide, the server 
+// downsamples longer histories.
+var max_points = document.getElementById("chart_contain").clientWidth;
+
+// The series is cached per resolution, a resized chart fetches its own.
+var cache_key = url + '?max_points=' + max_points;
+
+// Drop the entry cached before the key held the resolution.
+localStorage.removeItem(url);
+
+/**
+ * Fetches the graph data, only asking for what isn't already cached, and 
+ * updates the cache.
+ * @param {Object} cached What we fetched on earlier visits: the past days 
+ * up to the cursor, which won't change, and today's point with the ETag it 
+ * was sent with. null if nothing is cached.
+ * 
+ * @returns {Promise} Resolves to the points, today's point and cursor.
+ */
+function load(cached) {
+    var data_url = url + '?format=compact&max_points=' + max_points;
+    var headers = {};
+
+    if (cached) {
+        // Only ask for the days after the ones we have, and send the ETag 
+        // back so the server can tell us nothing has changed.
+        if (cached.cursor) {
+            data_url += '&since=' + cached.cursor;
+        }
+
+        headers['If-None-Match'] = cached.etag;
+    }
+
+    return fetch(data_url, {headers: headers}).then((response) => {
+        // Nothing changed, draw what we already have.
+        if (response.status === 304) {
+            return cached;
+        }
+
+        return response.json().then((data) => {
+            // The last point is today's balance.
+            var points = decode_compact(data);
+            var today = points.pop();
+
+            // Add the new days on to the ones we have.
+            if (cached) {
+                points = cached.points.concat(points);
+
+                // Too many days have been added on since the series was 
+                // downsampled, fetch it all again for the server to 
+                // downsample.
+                if (points.length + 1 > max_points) {
+                    localStorage.removeItem(cache_key);
+                    return load(null);
+                }
+            }
+
+            var latest = {points: points, today: today, 
+                          cursor: data.cursor, 
+                          etag: response.headers.get('ETag')};
+
+            localStorage.setItem(cache_key, JSON.stringify(latest));
+
+            return latest;
+        });
+    });
+}
+
+// Fetch the data, then make the chart.
+load(JSON.parse(localStorage.getItem(cache_key))).then(
+    (latest) => make_chart(latest.points.concat([latest.today])))
@@ -0,0 +1,19 @@
+from website.admin.routes import Admin_Tools
+from website import create_app
+
+# A script used to rebuild the daily balance rollup from the transaction 
+# history.
+def main():
+    """
+    Backfill Balance_Data from Transactions, replacing what is there.
+    """
+
+    app = create_app()
+
+    with app.app_context():
+        Admin_Tools.rebuild_bal_data()
+
+    return 1
+
+if __name__ == '__main__':
+    main()
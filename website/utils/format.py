@@ -1,4 +1,5 @@
 from datetime import datetime, date
+from decimal import Decimal, ROUND_HALF_UP
 
 def format_acc(acc):
     """Format attributes in an account object to prepare for html.
@@ -32,17 +33,85 @@ def format_money(num):
     """Format monetary values into a string that nicely represents them.
 
     Args:
-        num (float): The monetary amount.
+        num (int): The monetary amount in cents.
 
     Returns:
         str: The string formatted to show that it is a monetary amount. $xx.xx
     """    
 
+    # Split into whole dollars and cents, keeping the sign separate.
+    dollars, cents = divmod(abs(num), 100)
+
     # Display money balances correctly
     if num < 0:
-        return '-$%.2f' % abs(num)
+        return '-$%d.%02d' % (dollars, cents)
+
+    return '$%d.%02d' % (dollars, cents)
+
+def to_cents(amount):
+    """Convert a dollar amount, as entered in a form or sent as json, into 
+    the integer cents money is stored in. Half cents round away from zero.
+
+    Args:
+        amount (Decimal/str/float/int): The dollar amount.
+
+    Returns:
+        int: The amount in cents.
+    """    
+
+    # Go through str so floats convert as written rather than as stored.
+    cents = Decimal(str(amount)) * 100
+
+    return int(cents.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def to_dollars(cents):
+    """Convert integer cents into dollars, for data handed to javascript.
+
+    Args:
+        cents (int): The amount in cents.
+
+    Returns:
+        float: The amount in dollars.
+    """    
+
+    return cents / 100
+
+def to_dollar_str(cents):
+    """Write integer cents as an exact dollar amount with two decimal places, 
+    for exported files. Floats would drop trailing zeros (12.5).
+
+    Args:
+        cents (int): The amount in cents.
+
+    Returns:
+        str: The amount in dollars, e.g. 12.50 or -0.05.
+    """    
+
+    dollars, cents_part = divmod(abs(cents), 100)
+
+    return '%s%d.%02d' % ('-' if cents < 0 else '', dollars, cents_part)
+
+def compact_series(days, cents):
+    """Encode a daily balance series in columns for javascript. The first 
+    day is sent once as the base and every point after it as a whole number 
+    of days on from the point before, balances stay in integer cents. This 
+    avoids repeating a date string and a float for every point.
+
+    Args:
+        days (list[date]): The day of each point, in ascending order.
+        cents (list[int]): The balance at each point in cents.
+
+    Returns:
+        dict: A dictionary mapping "base" to the first day (YYYY-MM-DD, 
+        None if there are no points), "days" to the day steps (0 for the 
+        first point) and "cents" to the balances.
+    """    
+
+    steps = [(day - prev).days for prev, day in zip(days, days[1:])]
 
-    return '$%.2f' % num
+    return {'base': days[0].isoformat() if days else None, 
+            'days': [0] + steps if days else [], 
+            'cents': cents}
 
 def format_apy(num):
     """Format an interest rate amount to appear like an interest rate.
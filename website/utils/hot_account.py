@@ -0,0 +1,27 @@
+import sys
+from website.main.utils import set_shards
+from website import create_app
+
+# A script used to turn hot account mode on or off for an account, e.g.
+# python -m website.utils.hot_account 12 8 to spread credits to account 12 
+# over 8 shards, or 0 shards to turn it back off. Only helps on databases 
+# that lock rows (PostgreSQL), on SQLite it makes credits slower, see 
+# set_shards.
+def main():
+    """
+    Set the number of shards for the account given on the command line.
+    """
+
+    acc_no, shards = int(sys.argv[1]), int(sys.argv[2])
+
+    app = create_app()
+
+    with app.app_context():
+        if not set_shards(acc_no, shards):
+            print('That account does not exist.')
+            return 0
+
+    return 1
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+from sqlalchemy import event
+
+def engine_options(profile):
+    """Get the SQLAlchemy engine options for a storage profile.
+
+    Args:
+        profile (dict): The storage profile from app_config.json.
+
+    Returns:
+        dict: Keyword arguments for create_engine, e.g. pool sizes.
+    """    
+
+    return dict(profile.get('engine_options', {}))
+
+def read_only(profile):
+    """Check whether a storage profile opens the database read-only.
+
+    Args:
+        profile (dict): The storage profile from app_config.json.
+
+    Returns:
+        bool: True if nothing may be written through this profile.
+    """    
+
+    return str(profile.get('pragmas', {}).get('query_only', 'OFF')).upper() \
+        in ('ON', '1', 'TRUE')
+
+def apply_pragmas(engine, profile):
+    """Run the storage profile's pragmas on every new SQLite connection. 
+    Other databases are left alone.
+
+    Args:
+        engine (Engine): The engine to configure.
+        profile (dict): The storage profile from app_config.json.
+    """    
+
+    pragmas = profile.get('pragmas', {})
+
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+        cursor.close()
+
+    event.listen(engine, 'connect', set_pragmas)
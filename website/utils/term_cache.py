@@ -0,0 +1,73 @@
+import os
+from pathlib import Path
+from flask import current_app
+from website.models import Curr_Term
+
+# The current term as last read from the database, along with the stamp it 
+# was read under. Each worker process keeps its own copy.
+_cache = {'stamp': None, 'term': None}
+
+def term_stamp_path():
+    """Get the path of the term stamp file, which is replaced every time the 
+    term changes.
+
+    Returns:
+        Path: The path to the stamp file in the instance folder.
+    """    
+
+    return Path(current_app.instance_path) / current_app.config['TERM_STAMP']
+
+def read_term_stamp():
+    """Read the term stamp, a single stat call.
+
+    Returns:
+        tuple: The inode and modification time of the stamp file, None if 
+        it doesn't exist yet.
+    """    
+
+    try:
+        st = os.stat(term_stamp_path())
+    except FileNotFoundError:
+        return None
+
+    return (st.st_ino, st.st_mtime_ns)
+
+def invalidate_term():
+    """Replace the term stamp so every worker reloads the term on its next 
+    lookup. Call while still holding the write transaction that changed the 
+    term, see current_term.
+    """    
+
+    pth = term_stamp_path()
+    tmp = pth.with_name(pth.name + '.' + str(os.getpid()))
+
+    # Replacing the file gives it a new inode, so the stamp always changes.
+    tmp.write_text('')
+    os.replace(tmp, pth)
+
+def current_term():
+    """Get the current term, only querying Curr_Term when the term stamp has 
+    changed since the last lookup in this process.
+
+    Postings look up the term after their guarded update, while holding the 
+    database's write lock. The term can only change under that same lock 
+    (see Admin_Tools.inc_term), so a posting never records a stale term.
+
+    Returns:
+        int: The current term.
+    """    
+
+    stamp = read_term_stamp()
+
+    # Make sure there is a stamp to compare against from now on.
+    if stamp is None:
+        invalidate_term()
+        stamp = read_term_stamp()
+
+    if stamp != _cache['stamp']:
+        # Read the stamp before the term, if the term changes in between 
+        # the stamp will have changed again and the next lookup reloads.
+        _cache['term'] = Curr_Term.query.first().term
+        _cache['stamp'] = stamp
+
+    return _cache['term']
@@ -64,7 +64,8 @@ def term_interest(apy, term_len=52):
     """Calculate the yield over the term based on term length and apy.
 
     Args:
-        apy (float): The apy for the account.
+        apy (float): The apy for the account, or a column expression for it 
+        to compute the yield in SQL (see Admin_Tools.compound_range).
         term_len (int, optional): The number of terms in a year. 
         Defaults to 52. (52 weeks in a year)
 
@@ -73,3 +74,62 @@ def term_interest(apy, term_len=52):
     """    
 
     return apy / term_len
+
+def lttb(xs, ys, threshold):
+    """Downsample a series with Largest-Triangle-Three-Buckets, keeping the 
+    points that best preserve the shape of the line. The first and last 
+    points are always kept, the rest are split into buckets and from each 
+    bucket we keep the point making the largest triangle with the point 
+    kept before it and the average of the next bucket.
+
+    Args:
+        xs (list[float]): The x values, in ascending order.
+        ys (list[float]): The y values.
+        threshold (int): The most points to keep. 0 (or anything below 3) 
+        keeps every point.
+
+    Returns:
+        list[int]: The indices of the points to keep, in order.
+    """    
+
+    n = len(xs)
+
+    # Nothing to drop.
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    # The points between the first and last are split into buckets.
+    every = (n - 2) / (threshold - 2)
+
+    keep = [0]
+    a = 0
+
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+
+        # Average of the next bucket, the last point for the final bucket.
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_start >= n - 1:
+            next_start, next_end = n - 1, n
+
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        # Keep the point in this bucket making the largest triangle.
+        best, best_area = start, -1
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - 
+                       (xs[a] - xs[j]) * (avg_y - ys[a]))
+
+            if area > best_area:
+                best, best_area = j, area
+
+        keep.append(best)
+        a = best
+
+    keep.append(n - 1)
+
+    return keep
@@ -0,0 +1 @@
+from website.writer.client import submit
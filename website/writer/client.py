@@ -0,0 +1,51 @@
+import json
+import socket
+from pathlib import Path
+from flask import current_app
+from website.writer.commands import apply_command, UNKNOWN
+
+def submit(op, **args):
+    """Submit a posting command. With POSTING_MODE set to 'writer' the 
+    command is sent to the writer process over its unix socket, otherwise 
+    (or if the writer can't be reached) it is applied directly.
+
+    Args:
+        op (str): The posting command, 'withdraw', 'deposit' or 'transfer'.
+        **args: Keyword arguments for the posting function.
+
+    Returns:
+        str: The char code for the return, UNKNOWN[op] if the writer took 
+        the command but no reply came back.
+    """    
+
+    command = {'op': op, 'args': args}
+
+    if current_app.config['POSTING_MODE'] != 'writer':
+        return apply_command(command)
+
+    pth = Path(current_app.instance_path) / current_app.config['WRITER_SOCKET']
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(current_app.config['WRITER_TIMEOUT'])
+
+        try:
+            sock.connect(str(pth))
+
+        except (ConnectionError, FileNotFoundError):
+            # The writer is not running, postings are still safe to apply 
+            # from this worker since balances are changed with guarded 
+            # updates.
+            return apply_command(command)
+
+        try:
+            # Commands and replies are one line of json each.
+            sock.sendall(json.dumps(command, default=str).encode() + b'\n')
+            reply = sock.makefile('rb').readline()
+
+            return json.loads(reply)['flash_code']
+
+        except (OSError, ValueError, KeyError, TypeError):
+            # The writer timed out, hung up or sent back something we can't 
+            # read. It may already have applied the posting, so it must not 
+            # be applied again here.
+            return UNKNOWN[op]
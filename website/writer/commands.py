@@ -0,0 +1,62 @@
+from website import db
+from website.main.utils import make_withdrawal, make_deposit, make_transfer
+
+# The char code each posting command returns when we can't tell the caller 
+# whether it was applied, e.g. the writer never answered (see submit).
+UNKNOWN = {'withdraw': '3', 'deposit': '2', 'transfer': '6'}
+
+def apply_command(command, commit=True):
+    """Apply a posting command to the database. Used by both the writer 
+    process and the direct posting path so the two always agree.
+
+    Args:
+        command (dict): The command, "op" is one of 'withdraw', 'deposit' or 
+        'transfer' and "args" holds the keyword arguments for the matching 
+        posting function.
+        commit (bool, optional): Commit (or roll back) the posting, pass 
+        False to leave that to the caller, e.g. to commit a group of 
+        postings at once. Defaults to True.
+
+    Returns:
+        str: The char code for the return, the same codes the routes flash.
+    """    
+
+    op = command['op']
+    args = command['args']
+
+    if op == 'withdraw':
+        return make_withdrawal(commit=commit, **args)
+
+    if op == 'deposit':
+        return make_deposit(commit=commit, **args)
+
+    if op == 'transfer':
+        flash_code = make_transfer(**args)
+
+        # Transfers leave committing to the caller.
+        if commit:
+            if flash_code == '5':
+                db.session.commit()
+            else:
+                db.session.rollback()
+
+        return flash_code
+
+    raise ValueError('Unknown posting command: ' + str(op))
+
+def unknown_code(command):
+    """Get the char code telling the caller a command may or may not have 
+    been applied, see UNKNOWN.
+
+    Args:
+        command (dict): The command.
+
+    Returns:
+        str: The char code, '0' if the command is too malformed to have one.
+    """    
+
+    try:
+        return UNKNOWN[command['op']]
+
+    except (KeyError, TypeError):
+        return '0'
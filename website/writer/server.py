@@ -0,0 +1,131 @@
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from pathlib import Path
+from website import create_app, db
+from website.writer.commands import apply_command, unknown_code
+
+class Writer_Handler(socketserver.StreamRequestHandler):
+    """
+    Reads one command from a web worker, hands it to the writer thread and 
+    sends the result back.
+    """    
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        # Queue the command with a slot for the writer thread to fill in.
+        pending = {'command': json.loads(line), 'done': threading.Event()}
+        self.server.commands.put(pending)
+        pending['done'].wait()
+
+        self.wfile.write(json.dumps(
+            {'flash_code': pending['flash_code']}).encode() + b'\n')
+
+
+class Writer_Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Accepts connections from all web workers at once, but every command is 
+    applied by a single thread, in the order it arrived. Commands arriving 
+    within GROUP_COMMIT_WINDOW_MS of each other are committed together.
+    """    
+
+    daemon_threads = True
+
+    def __init__(self, app, pth):
+        self.app = app
+        self.commands = queue.Queue()
+
+        socketserver.UnixStreamServer.__init__(self, str(pth), Writer_Handler)
+
+    def next_group(self):
+        """Wait for a command, then gather every command that arrives within 
+        the group commit window.
+
+        Returns:
+            list[dict]: The pending commands, in arrival order.
+        """        
+
+        window = self.app.config['GROUP_COMMIT_WINDOW_MS'] / 1000
+
+        group = [self.commands.get()]
+        deadline = time.monotonic() + window
+
+        while True:
+            try:
+                group.append(self.commands.get(
+                    timeout=max(deadline - time.monotonic(), 0)))
+
+            except queue.Empty:
+                return group
+
+    def apply_commands(self):
+        """
+        Apply queued commands in groups, forever. Runs on its own thread. 
+        Each group is written in one database transaction, so postings that 
+        arrive together share a single commit.
+        """        
+
+        with self.app.app_context():
+            while True:
+                group = self.next_group()
+
+                try:
+                    for pending in group:
+                        pending['flash_code'] = apply_command(
+                            pending['command'], commit=False)
+
+                    db.session.commit()
+
+                except Exception:
+                    db.session.rollback()
+
+                    # Fall back to applying the group one command at a time 
+                    # so only the failing posting is lost.
+                    for pending in group:
+                        try:
+                            pending['flash_code'] = apply_command(
+                                pending['command'])
+
+                        except Exception:
+                            # Tell the caller to check their history rather 
+                            # than flashing one of the posting's own failures.
+                            db.session.rollback()
+                            pending['flash_code'] = unknown_code(
+                                pending['command'])
+
+                # Drop loaded objects so the next group reads fresh rows.
+                db.session.expunge_all()
+
+                for pending in group:
+                    pending['done'].set()
+
+
+def main():
+    """
+    Run the writer process, applying deposit, withdrawal and transfer 
+    commands from the web workers in order. Start alongside gunicorn and set 
+    POSTING_MODE to 'writer' in app_config.json.
+    """
+
+    app = create_app()
+
+    pth = Path(app.instance_path) / app.config['WRITER_SOCKET']
+
+    # Clear out a socket left behind by a previous run.
+    if pth.exists():
+        os.unlink(pth)
+
+    server = Writer_Server(app, pth)
+
+    threading.Thread(target=server.apply_commands, daemon=True).start()
+
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()